@@ -1,40 +1,16 @@
-import os
 from users.cashier import cashier_menu
 from users.manager import manager_menu
 from users.customer import customer_main
 from users.chef import chef_menu
-
-ACCOUNTS_FILE = "data/users.txt"
-
-
-def load_accounts():
-    accounts = {}
-    if not os.path.exists(ACCOUNTS_FILE):
-        os.makedirs("data", exist_ok=True)
-        open(ACCOUNTS_FILE, "w").close()
-
-    with open(ACCOUNTS_FILE, "r") as file:
-        for line in file:
-            line = line.strip()
-            if not line or ":" not in line:
-                continue
-            parts = line.split(":", 2)
-            if len(parts) != 3:
-                continue
-            username, password, role = parts
-            accounts[username] = {"password": password, "role": role}
-    return accounts
+from utils.accounts import authenticate
 
 
 def login(expected_role):
-    accounts = load_accounts()
-
     print(f"\n=== Login as {expected_role.capitalize()} ===")
     username = input("Username: ").strip()
     password = input("Password: ").strip()
 
-    user = accounts.get(username)
-    if user and user["password"] == password and user["role"] == expected_role:
+    if authenticate(username, password, expected_role):
         print(f"\n✅ Logged in successfully as {username} ({expected_role})")
         return True
     else:
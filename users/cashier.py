@@ -1,17 +1,15 @@
 from utils.helpers import load_file
 from utils.order_management import view_active_orders
-from utils.display import show_menu, show_promo_codes, daily_sales_report
+from utils.display import show_menu, show_promo_codes, sales_report_menu
 
 def cashier_menu():
     while True:
-        current_orders = load_file("current_active_orders.txt")
-        transactions = load_file("transactions.txt")
         menu_items = load_file("menu_items.txt")
         promo_codes = load_file("promo_codes.txt")
 
         print("\n=== Cashier Menu ===")
         print("1. Current Active Orders")
-        print("2. Daily Sales Report")
+        print("2. Sales Report")
         print("3. View Menu")
         print("4. View Promo Codes")
         print("5. Exit")
@@ -19,10 +17,10 @@ def cashier_menu():
         choice = input("Select an option: ").strip()
 
         if choice == '1':
-            view_active_orders(current_orders, menu_items, transactions)
+            view_active_orders(menu_items)
 
         elif choice == '2':
-            daily_sales_report(transactions, menu_items)
+            sales_report_menu(menu_items)
 
         elif choice == '3':
             show_menu(menu_items)
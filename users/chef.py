@@ -1,4 +1,3 @@
-import json
 import os
 import sys
 import textwrap
@@ -6,6 +5,9 @@ import textwrap
 # import active orders function
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.order_management import chef_view_active_orders
+from utils.helpers import load_file, load_file_if_exists, save_to_file
+from utils.inventory import build_stock_plan, max_servings, prep_shortages
+from utils.catalogue import MENU_FILE, fold, ingredient_id, build_catalogue, dangling_references
 
 # Ensure the parent directory is in the path for module imports
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -21,17 +23,11 @@ EQUIPMENT_FILE = os.path.join(DATA_DIR, "equipment.txt")
 # Utility Functions    
 
 def load_data(file_path):
-    if not os.path.exists(file_path):
-        return {}
-    with open(file_path, "r", encoding="utf-8") as file:
-        try:
-            return json.load(file)
-        except json.JSONDecodeError:
-            return {}
+    # Same data/<file> key as helpers, so a queued save is flushed before the read
+    return dict(load_file_if_exists(os.path.basename(file_path)))
 
 def save_data(file_path, data_dict):
-    with open(file_path, "w", encoding="utf-8") as file:
-        json.dump(data_dict, file, indent=4)
+    save_to_file(data_dict, os.path.basename(file_path))
 
 def input_non_empty(prompt):
     value = ""
@@ -56,9 +52,9 @@ def input_positive_int(prompt):
         except ValueError:
             print("Please enter a valid number!")
 
-def save_all_data(recipe_data, inventory_data, equipment_data):
+def save_all_data(recipe_data, equipment_data):
+    # Inventory is left alone: checkouts may have changed it since the chef menu loaded it
     save_data(RECIPE_FILE, recipe_data)
-    save_data(INVENTORY_FILE, inventory_data)
     save_data(EQUIPMENT_FILE, equipment_data)
 
 # Recipe Functions 
@@ -90,9 +86,10 @@ def view_recipe(recipe_data):
 def add_recipe(recipe_data):
     recipe_name = input_non_empty("Enter recipe name: ")
     ingredients = input_non_empty("Enter ingredients (comma separated): ").split(",")
-    recipe_data[recipe_name] = [i.strip().lower() for i in ingredients]
+    recipe_data[recipe_name] = [ingredient_id(i) for i in ingredients]
     save_data(RECIPE_FILE, recipe_data)
     print(f"Recipe '{recipe_name}' added!")
+    warn_unknown_references(recipe_name, recipe_data[recipe_name])
     input("\nPress Enter to return to menu...")
     return recipe_data
 
@@ -114,9 +111,10 @@ def update_recipe(recipe_data):
 
     recipe_name = list(recipe_data.keys())[choice-1]
     new_ingredients = input_non_empty(f"Enter new ingredients for '{recipe_name}': ").split(",")
-    recipe_data[recipe_name] = [i.strip().lower() for i in new_ingredients] # Remove empty strings and convert ingredients to lowercase
+    recipe_data[recipe_name] = [ingredient_id(i) for i in new_ingredients]
     save_data(RECIPE_FILE, recipe_data)
     print(f"Updated recipe '{recipe_name}'.")
+    warn_unknown_references(recipe_name, recipe_data[recipe_name])
     input("\nPress Enter to return to menu...")
     return recipe_data
 
@@ -143,6 +141,14 @@ def delete_recipe(recipe_data):
     input("\nPress Enter to return to menu...")
     return recipe_data
 
+def warn_unknown_references(recipe_name, ingredients):
+    if recipe_name not in build_catalogue(load_file(MENU_FILE), {recipe_name: ingredients})['recipe_codes']:
+        print(f"Note: no menu item is called '{recipe_name}', so orders will not use this recipe.")
+    inventory_data = {ingredient_id(k) for k in load_data(INVENTORY_FILE)}
+    missing = [ing for ing in ingredients if ing not in inventory_data]
+    if missing:
+        print(f"Note: not in inventory: {', '.join(missing)}")
+
 # Inventory Check 
 
 def check_inventory(recipe_data, inventory_data):
@@ -164,13 +170,15 @@ def check_inventory(recipe_data, inventory_data):
     recipe_name = list(recipe_data.keys())[choice-1]
     num_servings = input_positive_int(f"How many servings of '{recipe_name}' do you want to check? ")
 
+    # Only a check: checkouts deduct what is actually sold, so read the counts on file
+    inventory_data = {ingredient_id(k): v for k, v in load_data(INVENTORY_FILE).items()}
     required_counts = {}
     for ing in recipe_data[recipe_name]:
-        required_counts[ing.lower()] = required_counts.get(ing.lower(), 0) + num_servings
+        required_counts[ingredient_id(ing)] = required_counts.get(ingredient_id(ing), 0) + num_servings
 
     not_enough = []
     for ing, required_qty in required_counts.items():
-        available_qty = inventory_data.get(ing.lower(), 0)
+        available_qty = inventory_data.get(ing, 0)
         if available_qty < required_qty:
             missing_qty = required_qty - available_qty
             not_enough.append((ing, required_qty, available_qty, missing_qty))
@@ -181,14 +189,9 @@ def check_inventory(recipe_data, inventory_data):
         print("=" * 50)
         print("All ingredients are available:")
         for ing, required_qty in required_counts.items():
-            available_qty = inventory_data.get(ing.lower(), 0)
+            available_qty = inventory_data.get(ing, 0)
             print(f" • {ing}: need {required_qty}, available {available_qty}")
         print("=" * 50)
-
-        for ing, required_qty in required_counts.items():
-            inventory_data[ing.lower()] -= required_qty
-        save_data(INVENTORY_FILE, inventory_data)
-        print("Inventory updated.")
     else:
         print("\n" + "=" * 50)
         print(f"Sorry! Cannot prepare {num_servings} serving(s) of '{recipe_name}'.")
@@ -201,6 +204,80 @@ def check_inventory(recipe_data, inventory_data):
     input("\nPress Enter to return to menu...")
     return recipe_data, inventory_data
 
+# Prep Planner
+
+def parse_prep_list(text, recipe_names):
+    # "1=40, Fish Burger=30" -> {"Cheese Burger": 40, "Fish Burger": 30}
+    by_name = {fold(name): name for name in recipe_names}
+    prep_list = {}
+    for entry in text.split(","):
+        if not entry.strip():
+            continue
+        recipe, _, servings = entry.partition("=")
+        recipe = recipe.strip()
+        if recipe.isdigit() and 1 <= int(recipe) <= len(recipe_names):
+            name = recipe_names[int(recipe) - 1]
+        else:
+            name = by_name.get(fold(recipe))
+        if name is None:
+            print(f"Unknown recipe '{recipe}'.")
+            return None
+        try:
+            count = int(servings)
+        except ValueError:
+            count = 0
+        if count < 1:
+            print(f"Invalid servings for '{name}', enter a whole number of at least 1.")
+            return None
+        prep_list[name] = prep_list.get(name, 0) + count
+    return prep_list
+
+def plan_prep(recipe_data):
+    if not recipe_data:
+        print("No recipes available to plan.")
+        input("\nPress Enter to return to menu...")
+        return
+
+    inventory_data = {ingredient_id(k): v for k, v in load_data(INVENTORY_FILE).items()}
+    plan = build_stock_plan(recipe_data, inventory_data)
+    problems = dangling_references(load_file(MENU_FILE), recipe_data, inventory_data)
+    if problems:
+        print("\nData warnings:")
+        for problem in problems:
+            print(f" • {problem}")
+
+    print("\n" + "-" * 80)
+    print(f"{'MAXIMUM SERVINGS FROM CURRENT STOCK':^80}")
+    print("-" * 80)
+    print(f"{'No.':<4} {'Recipe Name':<30} {'Servings':>10}   {'Limited By'}")
+    print("-" * 80)
+    for i, (name, servings, limiting) in enumerate(max_servings(plan), 1):
+        shown = "-" if servings is None else servings
+        print(f"{i:<4} {name:<30} {shown:>10}   {limiting or ''}")
+    print("-" * 80)
+
+    while True:
+        text = input("\nEnter prep list as recipe=servings, comma separated (e.g. 1=40, 4=30), or Enter to return: ").strip()
+        if not text:
+            return
+        prep_list = parse_prep_list(text, plan['recipes'])
+        if not prep_list:
+            continue
+
+        shortages = prep_shortages(plan, prep_list)
+        summary = ", ".join(f"{servings} {name}" for name, servings in prep_list.items())
+        print("\n" + "=" * 50)
+        if not shortages:
+            print(f"Prep list can be prepared: {summary}")
+            print("=" * 50)
+            continue
+        print(f"Not enough stock for: {summary}")
+        print("=" * 50)
+        print("Insufficient ingredients:")
+        for item, required, available, missing in shortages:
+            print(f" • {item}: need {required:g}, available {available:g}, missing {missing:g}")
+        print("=" * 50)
+
 # Equipment Issues 
 
 def report_equipment_issue(equipment_data):
@@ -242,7 +319,7 @@ def manage_recipes(recipe_data):
 def chef_menu():
     recipe_data = load_data(RECIPE_FILE)
     inventory_data = load_data(INVENTORY_FILE)
-    inventory_data = {k.lower(): v for k, v in inventory_data.items()}
+    inventory_data = {ingredient_id(k): v for k, v in inventory_data.items()}
     equipment_data = load_data(EQUIPMENT_FILE)
     while True:
         print("\nChef Menu:")
@@ -250,8 +327,9 @@ def chef_menu():
         print("2. Check Inventory")
         print("3. Report Equipment Issue")
         print("4. View Active Orders")
-        print("5. Exit")
-        choice = input("Choose (1–5): ").strip()
+        print("5. Plan Prep")
+        print("6. Exit")
+        choice = input("Choose (1–6): ").strip()
         if choice == "1":
             recipe_data = manage_recipes(recipe_data)
         elif choice == "2":
@@ -261,6 +339,8 @@ def chef_menu():
         elif choice == "4":
             chef_view_active_orders()
         elif choice == "5":
+            plan_prep(recipe_data)
+        elif choice == "6":
             break
         else:
             print("Invalid choice. Please try again.")
@@ -270,4 +350,4 @@ def chef_menu():
 
 if __name__ == "__main__":
     recipe_data, inventory_data, equipment_data = chef_menu()
-    save_all_data(recipe_data, inventory_data, equipment_data)
\ No newline at end of file
+    save_all_data(recipe_data, equipment_data)
\ No newline at end of file
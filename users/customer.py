@@ -10,7 +10,7 @@ import os
 
 def load_initial_data():
     os.makedirs("data", exist_ok=True)
-    for file in ["carts.txt", "current_active_orders.txt","customers.txt" "review.txt"]:
+    for file in ["current_active_orders.txt","customers.txt" "review.txt"]:
         if not os.path.exists(f"data/{file}"):
             open(f"data/{file}", "w").close()
 
@@ -23,10 +23,6 @@ def load_initial_data():
 
 def customer_main():
     state = load_initial_data()
-    current_orders = {} 
-    transactions = []
-    menu_items = load_file('menu_items.txt')
-    promo_codes = load_file('promo_codes.txt')
 
     while True:
         print("\n" + "=" * 40)
@@ -7,6 +7,7 @@ from utils.manager_utils import view_all_orders
 from utils.manager_utils import view_customer_feedback
 from utils.manager_utils import track_finances
 from utils.manager_utils import manage_promo_codes
+from utils.aggregates import rebuild_sales_aggregates
 from .chef import  check_inventory, load_data
 
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -27,9 +28,10 @@ def manager_menu():
         print("4. Manage Inventory")
         print("5. View Customer Feedback")
         print("6. Promo Code Management")
-        print("7. Exit")
+        print("7. Rebuild Sales Aggregates")
+        print("8. Exit")
 
-        choice = input("Choose option (1-7): ").strip()
+        choice = input("Choose option (1-8): ").strip()
 
         if choice == "1":
             manage_user_accounts()
@@ -44,6 +46,8 @@ def manager_menu():
         elif choice == "6":
             manage_promo_codes()
         elif choice == "7":
+            rebuild_sales_aggregates()
+        elif choice == "8":
             print("Exiting manager menu.")
             break
         else:
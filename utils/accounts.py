@@ -0,0 +1,140 @@
+import hashlib
+import hmac
+import os
+import secrets
+import sys
+import time
+from utils.helpers import DATA_DIR, atomic_write, cached_load, file_lock
+
+USERS_FILE = os.path.join(DATA_DIR, "users.txt")
+HASH_SCHEME = "pbkdf2_sha256"
+# PBKDF2 rounds per password; raise it as hardware gets faster, keeping a login
+# under TARGET_LOGIN_MS (python -m utils.accounts benchmark suggests a value)
+PASSWORD_ITERATIONS = int(os.environ.get("RESTAURANT_PASSWORD_ITERATIONS", 200000))
+TARGET_LOGIN_MS = 250
+
+def hash_password(password, iterations=None):
+    # "pbkdf2_sha256$rounds$salt$hash" has no ':' so users.txt keeps its user:password:role lines
+    iterations = iterations or PASSWORD_ITERATIONS
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), iterations)
+    return f"{HASH_SCHEME}${iterations}${salt}${digest.hex()}"
+
+# Checked against for unknown usernames, so they cost the same single PBKDF2 run as a
+# wrong password and timing does not reveal which usernames exist
+DUMMY_HASH = hash_password(secrets.token_hex(16))
+
+def is_hashed(stored):
+    return stored.startswith(HASH_SCHEME + "$")
+
+def verify_password(password, stored):
+    if not is_hashed(stored):
+        # Entries written before hashing; rehashed on the next successful login
+        return hmac.compare_digest(password.encode(), stored.encode())
+    try:
+        _, iterations, salt, digest = stored.split("$")
+        check = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(check.hex(), digest)
+
+def needs_rehash(stored):
+    return not is_hashed(stored) or stored.split("$")[1] != str(PASSWORD_ITERATIONS)
+
+def parse_accounts(path):
+    accounts = {}
+    if not os.path.exists(path):
+        return accounts
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            parts = line.strip().split(":", 2)
+            if len(parts) != 3:
+                continue
+            username, password, role = parts
+            accounts[username] = {"password": password, "role": role}
+    return accounts
+
+def load_accounts():
+    # username -> {"password", "role"}, parsed once per version of users.txt and shared
+    # between callers, so copy before changing it
+    return cached_load(USERS_FILE, parse_accounts, [USERS_FILE])
+
+def save_accounts(accounts):
+    atomic_write(USERS_FILE, "".join(
+        f"{username}:{data['password']}:{data['role']}\n" for username, data in accounts.items()
+    ), backup=True)
+
+def add_account(username, password, role):
+    # False if the username is taken
+    with file_lock(USERS_FILE):
+        accounts = dict(load_accounts())
+        if username in accounts:
+            return False
+        accounts[username] = {"password": hash_password(password), "role": role}
+        save_accounts(accounts)
+        return True
+
+def remove_account(username):
+    with file_lock(USERS_FILE):
+        accounts = dict(load_accounts())
+        if accounts.pop(username, None) is None:
+            return False
+        save_accounts(accounts)
+        return True
+
+def rehash_account(username, password):
+    with file_lock(USERS_FILE):
+        accounts = dict(load_accounts())
+        account = accounts.get(username)
+        if account and needs_rehash(account["password"]) and verify_password(password, account["password"]):
+            accounts[username] = dict(account, password=hash_password(password))
+            save_accounts(accounts)
+
+def authenticate(username, password, role=None):
+    account = load_accounts().get(username)
+    if account is None:
+        verify_password(password, DUMMY_HASH)
+        return False
+    if not verify_password(password, account["password"]) or (role and account["role"] != role):
+        return False
+    if needs_rehash(account["password"]):
+        rehash_account(username, password)
+    return True
+
+def migrate_passwords():
+    # Hashes every plaintext password in users.txt; returns how many were converted
+    with file_lock(USERS_FILE):
+        accounts = dict(load_accounts())
+        plain = [username for username, data in accounts.items() if not is_hashed(data["password"])]
+        for username in plain:
+            accounts[username] = dict(accounts[username], password=hash_password(accounts[username]["password"]))
+        if plain:
+            save_accounts(accounts)
+        return len(plain)
+
+def benchmark_iterations(target_ms=TARGET_LOGIN_MS):
+    # Largest round count, in steps of 10,000, whose hash fits in target_ms on this machine
+    sample = 50000
+    start = time.perf_counter()
+    hashlib.pbkdf2_hmac("sha256", b"benchmark", secrets.token_bytes(16), sample)
+    per_round = (time.perf_counter() - start) / sample
+    return max(10000, int(target_ms / 1000 / per_round) // 10000 * 10000)
+
+def time_login(iterations):
+    stored = hash_password("benchmark", iterations)
+    start = time.perf_counter()
+    verify_password("benchmark", stored)
+    return (time.perf_counter() - start) * 1000
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "migrate":
+        print(f"Hashed {migrate_passwords()} plaintext password(s) in {USERS_FILE}.")
+    elif command == "benchmark":
+        target = float(sys.argv[2]) if len(sys.argv) > 2 else TARGET_LOGIN_MS
+        suggested = benchmark_iterations(target)
+        print(f"Current: {PASSWORD_ITERATIONS} rounds, {time_login(PASSWORD_ITERATIONS):.0f} ms per login")
+        print(f"Suggested for {target:.0f} ms: {suggested} rounds, {time_login(suggested):.0f} ms per login")
+        print(f"Set RESTAURANT_PASSWORD_ITERATIONS={suggested} to use it.")
+    else:
+        print("Usage: python -m utils.accounts [migrate | benchmark [target_ms]]")
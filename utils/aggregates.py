@@ -0,0 +1,168 @@
+import os
+from utils import write_queue
+from utils.models import order_lines
+from utils.helpers import DATA_DIR, load_file, write_records, save_to_file, iter_transactions, journal_path, use_sqlite, data_lock
+
+AGGREGATES_FILE = "sales_aggregates.txt"
+ALL_TIME_KEY = "all_time"
+
+def empty_aggregate():
+    return {
+        'total_sales': 0,
+        'total_discounts': 0,
+        'order_count': 0,
+        'payment_types': {
+            'cash': {'total': 0, 'count': 0},
+            'card': {'total': 0, 'count': 0},
+            "touch 'n go": {'total': 0, 'count': 0}
+        },
+        'dine_in': {'total': 0, 'count': 0},
+        'take_away': {'total': 0, 'count': 0},
+        'item_sales': {},
+        'promo_codes': {}
+    }
+
+def add_transaction(aggregate, transaction):
+    total = transaction['total']
+    aggregate['total_sales'] += total
+    aggregate['order_count'] += 1
+
+    for discount in transaction.get('discounts', []):
+        aggregate['total_discounts'] += discount.get('amount', 0)
+        if discount.get('promo_code'):
+            code = discount['promo_code']
+            aggregate['promo_codes'][code] = aggregate['promo_codes'].get(code, 0) + 1
+
+    # Normalize payment method for comparison
+    payment_method = transaction.get('payment_method', '').lower()
+    if "card" in payment_method:
+        payment_type = 'card'
+    elif "cash" in payment_method:
+        payment_type = 'cash'
+    elif "touch" in payment_method or "n go" in payment_method:
+        payment_type = "touch 'n go"
+    else:
+        payment_type = None
+    if payment_type:
+        aggregate['payment_types'][payment_type]['total'] += total
+        aggregate['payment_types'][payment_type]['count'] += 1
+
+    # Matches "Dine-In" or "Dine In", anything else is takeaway
+    order_type = 'dine_in' if "dine" in transaction.get('type', '').lower() else 'take_away'
+    aggregate[order_type]['count'] += 1
+    aggregate[order_type]['total'] += total
+
+    for line in order_lines(transaction):
+        aggregate['item_sales'][line.code] = aggregate['item_sales'].get(line.code, 0) + line.quantity
+    return aggregate
+
+def merge_aggregates(aggregates):
+    merged = empty_aggregate()
+    for aggregate in aggregates:
+        merged['total_sales'] += aggregate['total_sales']
+        merged['total_discounts'] += aggregate['total_discounts']
+        merged['order_count'] += aggregate['order_count']
+        for method, data in aggregate['payment_types'].items():
+            merged['payment_types'][method]['total'] += data['total']
+            merged['payment_types'][method]['count'] += data['count']
+        for order_type in ('dine_in', 'take_away'):
+            merged[order_type]['total'] += aggregate[order_type]['total']
+            merged[order_type]['count'] += aggregate[order_type]['count']
+        for item_code, qty in aggregate['item_sales'].items():
+            merged['item_sales'][item_code] = merged['item_sales'].get(item_code, 0) + qty
+        for code, count in aggregate['promo_codes'].items():
+            merged['promo_codes'][code] = merged['promo_codes'].get(code, 0) + count
+    return merged
+
+def compute_aggregates(transactions):
+    # Takes any iterable of (order_id, transaction), so the history can be streamed through
+    aggregates = {ALL_TIME_KEY: empty_aggregate()}
+    for order_id, transaction in transactions:
+        day = transaction.get('timestamp', '')[:10] or "unknown"
+        add_transaction(aggregates.setdefault(day, empty_aggregate()), transaction)
+        aggregates[day].setdefault('order_ids', []).append(order_id)
+        add_transaction(aggregates[ALL_TIME_KEY], transaction)
+    return aggregates
+
+def load_aggregates():
+    path = os.path.join(DATA_DIR, AGGREGATES_FILE)
+    write_queue.flush(path)
+    exists = os.path.exists(path) or os.path.exists(journal_path(AGGREGATES_FILE))
+    aggregates = load_file(AGGREGATES_FILE) if use_sqlite() or exists else {}
+    if not aggregates:
+        # First run after upgrading: build the counters from existing history
+        aggregates = compute_aggregates(iter_transactions())
+        save_to_file(aggregates, AGGREGATES_FILE)
+    return aggregates
+
+def record_sales(transactions):
+    # transactions is {order_id: transaction}. Orders already counted for their day are
+    # skipped, so repeating a checkout that stopped part-way never counts a sale twice.
+    # Returns the order ids counted now.
+    # Read-modify-write of shared counters, so other terminals wait until all are saved
+    with data_lock(AGGREGATES_FILE):
+        aggregates = load_aggregates()
+        updated = {}
+        counted = []
+        for order_id, transaction in transactions.items():
+            day = transaction['timestamp'][:10]
+            if order_id in (updated.get(day) or aggregates.get(day) or {}).get('order_ids', []):
+                continue
+            for key in (day, ALL_TIME_KEY):
+                if key not in updated:
+                    updated[key] = aggregates.get(key) or empty_aggregate()
+                add_transaction(updated[key], transaction)
+            updated[day].setdefault('order_ids', []).append(order_id)
+            counted.append(order_id)
+        if updated:
+            write_records(AGGREGATES_FILE, [{"op": "upsert", "key": key, "value": aggregate}
+                                            for key, aggregate in updated.items()])
+        return counted
+
+def load_period_aggregate(start_day, end_day):
+    aggregates = load_aggregates()
+    return merge_aggregates(
+        aggregate for day, aggregate in aggregates.items()
+        if day != ALL_TIME_KEY and start_day <= day <= end_day
+    )
+
+def load_all_time_aggregate():
+    return load_aggregates().get(ALL_TIME_KEY) or empty_aggregate()
+
+def _differences(stored, rebuilt, path=""):
+    if isinstance(stored, list) or isinstance(rebuilt, list):
+        # Order ids counted for a day, reported by how many there are
+        stored = stored if isinstance(stored, list) else []
+        rebuilt = rebuilt if isinstance(rebuilt, list) else []
+        if sorted(stored) != sorted(rebuilt):
+            return [(path, len(stored), len(rebuilt))]
+        return []
+    if isinstance(stored, dict) or isinstance(rebuilt, dict):
+        stored = stored if isinstance(stored, dict) else {}
+        rebuilt = rebuilt if isinstance(rebuilt, dict) else {}
+        differences = []
+        for key in set(stored) | set(rebuilt):
+            differences += _differences(stored.get(key, 0), rebuilt.get(key, 0), f"{path}/{key}")
+        return differences
+    if abs((stored or 0) - rebuilt) > 0.005:
+        return [(path, stored, rebuilt)]
+    return []
+
+def rebuild_sales_aggregates():
+    with data_lock(AGGREGATES_FILE):
+        stored = load_aggregates()
+        rebuilt = compute_aggregates(iter_transactions())
+        differences = []
+        for day in sorted(set(stored) | set(rebuilt)):
+            differences += _differences(stored.get(day, {}), rebuilt.get(day, empty_aggregate()), day)
+
+        save_to_file(rebuilt, AGGREGATES_FILE)
+    if differences:
+        print(f"\nRebuilt sales aggregates, {len(differences)} counter(s) were out of date:")
+        for path, old, new in differences:
+            print(f"  - {path}: {old} -> {new}")
+    else:
+        print("\nSales aggregates verified, all counters match the transactions.")
+
+if __name__ == "__main__":
+    rebuild_sales_aggregates()
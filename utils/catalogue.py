@@ -0,0 +1,102 @@
+from utils.helpers import load_file
+
+MENU_FILE = "menu_items.txt"
+RECIPE_FILE = "recipe.txt"
+INVENTORY_FILE = "inventory.txt"
+
+# Index for the menu and recipes currently in use; load_file hands back the same
+# dicts until either file changes, so identity is enough to spot a new version
+_compiled_catalogue = {"menu": None, "recipes": None, "catalogue": None}
+
+def fold(name):
+    # "  Beef  Patty" and "beef patty" are the same name
+    return " ".join(str(name).split()).casefold()
+
+def ingredient_id(name):
+    # Ingredients are identified by their folded name, which is also the inventory key
+    return fold(name)
+
+def dish_keys(name):
+    # "Nugget (4 Pcs)" is also known by its recipe name "Nugget"
+    keys = [fold(name)]
+    if name.rstrip().endswith(")") and "(" in name:
+        keys.append(fold(name[:name.rindex("(")]))
+    return keys
+
+def build_catalogue(menu_items, recipes):
+    recipe_names = {fold(recipe): recipe for recipe in recipes}
+    dishes = {}
+    names = {}
+    for code, item in menu_items.items():
+        name = item.get('name', code)
+        recipe = next((recipe_names[key] for key in dish_keys(name) if key in recipe_names), None)
+        dishes[code] = {'name': name, 'recipe': recipe}
+        names.setdefault(fold(code), code)
+        names.setdefault(fold(name), code)
+    recipe_codes = {}
+    for code, dish in dishes.items():
+        if dish['recipe']:
+            recipe_codes.setdefault(dish['recipe'], []).append(code)
+    for recipe in recipes:
+        if recipe in recipe_codes:
+            names.setdefault(fold(recipe), recipe_codes[recipe][0])
+    # ingredient id -> display name, Title Case from the menu where it appears there
+    ingredients = {}
+    for item in menu_items.values():
+        for name in item.get('ingredients', {}):
+            ingredients.setdefault(ingredient_id(name), name)
+    for needed in recipes.values():
+        for name in needed:
+            ingredients.setdefault(ingredient_id(name), name.strip())
+    return {'dishes': dishes, 'names': names, 'recipe_codes': recipe_codes, 'ingredients': ingredients}
+
+def get_catalogue(menu_items=None):
+    menu_items = load_file(MENU_FILE) if menu_items is None else menu_items
+    recipes = load_file(RECIPE_FILE)
+    if _compiled_catalogue["menu"] is not menu_items or _compiled_catalogue["recipes"] is not recipes:
+        _compiled_catalogue["menu"] = menu_items
+        _compiled_catalogue["recipes"] = recipes
+        _compiled_catalogue["catalogue"] = build_catalogue(menu_items, recipes)
+    return _compiled_catalogue["catalogue"]
+
+def resolve_dish(text, menu_items=None):
+    # Menu code for a code, display name or recipe name in any case; None if unknown
+    return get_catalogue(menu_items)['names'].get(fold(text))
+
+def recipe_for(code, menu_items=None):
+    dish = get_catalogue(menu_items)['dishes'].get(code)
+    return dish['recipe'] if dish else None
+
+def dangling_references(menu_items, recipes, inventory):
+    catalogue = build_catalogue(menu_items, recipes)
+    stock = {ingredient_id(name) for name in inventory}
+    problems = []
+    for code, item in menu_items.items():
+        for component in item.get('contents', {}):
+            if component not in menu_items:
+                problems.append(f"Combo {code} ({item.get('name', code)}) contains unknown item {component}")
+        if 'contents' not in item and item.get('category') != 'Drinks' and not catalogue['dishes'][code]['recipe']:
+            problems.append(f"Menu item {code} ({item.get('name', code)}) has no recipe")
+        for name in item.get('ingredients', {}):
+            if ingredient_id(name) not in stock:
+                problems.append(f"Menu item {code} uses '{name}', which is not in inventory")
+    for recipe, needed in recipes.items():
+        if recipe not in catalogue['recipe_codes']:
+            problems.append(f"Recipe '{recipe}' does not match any menu item")
+        for name in needed:
+            if ingredient_id(name) not in stock:
+                problems.append(f"Recipe '{recipe}' needs '{name.strip()}', which is not in inventory")
+    return problems
+
+def validate_catalogue():
+    problems = dangling_references(load_file(MENU_FILE), load_file(RECIPE_FILE), load_file(INVENTORY_FILE))
+    if problems:
+        print(f"\nFound {len(problems)} dangling reference(s):")
+        for problem in problems:
+            print(f"  - {problem}")
+    else:
+        print("\nMenu, recipes and inventory all refer to each other correctly.")
+    return problems
+
+if __name__ == "__main__":
+    validate_catalogue()
@@ -1,77 +1,109 @@
 import os
-import json
+import ast
 from datetime import datetime
-from utils.helpers import load_file, load_order_counters, save_order_counters
-
-def load_cart(user):
-    cart = []
+from urllib.parse import quote, unquote
+from utils.helpers import DATA_DIR, load_file, load_text_file, save_to_file, data_lock, allocate_order_id, save_record, use_sqlite
+from utils import sqlite_store, write_queue
+from utils.models import line_from_cart_item, line_to_dict
+from utils.order_events import publish_status
+from utils.user_orders import index_orders, ACTIVE
+from utils.inventory import get_availability, is_sold_out, cart_shortages, ingredient_usage, reserve_ingredients
+
+CARTS_DIR = "carts"
+LEGACY_CARTS_FILE = os.path.join(DATA_DIR, "carts.txt")
+
+def cart_file(user):
+    # One small JSON file per user; quoting keeps any username a safe file name
+    return f"{CARTS_DIR}/cart_{quote(user, safe='')}.txt"
+
+def load_legacy_carts():
+    carts = {}
     try:
-        with open("data/carts.txt", "r") as f:
+        with open(LEGACY_CARTS_FILE, "r") as f:
             for line in f:
                 parts = line.strip().split("|||")
-                if parts[0] == user:
-                    for item_str in parts[1:]:
-                        try:
-                            item = eval(item_str)
-                            if not isinstance(item, dict):
-                                continue
-                            if 'remarks' not in item:
-                                item['remarks'] = ''
-                            cart.append(item)
-                        except:
-                            continue
-                    break
-    except (FileNotFoundError, SyntaxError):
+                if not parts[0]:
+                    continue
+                cart = []
+                for item_str in parts[1:]:
+                    try:
+                        item = ast.literal_eval(item_str)
+                    except (ValueError, SyntaxError):
+                        continue
+                    if not isinstance(item, dict):
+                        continue
+                    item.setdefault('remarks', '')
+                    cart.append(item)
+                carts[parts[0]] = cart
+    except FileNotFoundError:
         pass
-    return cart
+    return carts
 
-def load_menu():
-    os.makedirs("data", exist_ok=True)
-    try:
-        with open("data/menu_items.txt", "r") as f:
-            content = f.read().strip()
-            if not content:
-                return {}
-            return json.loads(content)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print("Menu file not found или содержит ошибку!")
-        return {}
-
-def save_cart(user, cart):
-    os.makedirs("data", exist_ok=True)
+def migrate_legacy_carts():
+    if not os.path.exists(LEGACY_CARTS_FILE):
+        return
+    with data_lock(os.path.basename(LEGACY_CARTS_FILE)):
+        # Another terminal may have finished the migration while we waited
+        if not os.path.exists(LEGACY_CARTS_FILE):
+            return
+        for user, cart in load_legacy_carts().items():
+            if not cart:
+                continue
+            if use_sqlite():
+                if not sqlite_store.load_cart(user):
+                    sqlite_store.save_cart(user, cart)
+            elif not os.path.exists(os.path.join(DATA_DIR, cart_file(user))):
+                save_to_file({"user": user, "items": cart}, cart_file(user))
+                write_queue.flush(os.path.join(DATA_DIR, cart_file(user)))
+        os.replace(LEGACY_CARTS_FILE, LEGACY_CARTS_FILE + ".migrated")
+
+def load_text_carts():
+    # Per-user cart files, read from disk whichever backend is active
+    write_queue.flush()
     carts = {}
     try:
-        with open("data/carts.txt", "r") as f:
-            for line in f:
-                parts = line.strip().split("|||")
-                if parts:
-                    carts[parts[0]] = parts[1:]
+        names = os.listdir(os.path.join(DATA_DIR, CARTS_DIR))
     except FileNotFoundError:
-        pass
+        return carts
+    for name in names:
+        if name.startswith("cart_") and name.endswith(".txt"):
+            user = unquote(name[len("cart_"):-len(".txt")])
+            carts[user] = load_text_file(cart_file(user)).get("items", [])
+    return carts
 
-    carts[user] = [str(item) for item in cart]
-    with open("data/carts.txt", "w") as f:
-        for username, items in carts.items():
-            if username:
-                f.write(f"{username}|||{'|||'.join(items)}\n")
+def load_cart(user):
+    migrate_legacy_carts()
+    if use_sqlite():
+        return sqlite_store.load_cart(user)
+    write_queue.flush(os.path.join(DATA_DIR, cart_file(user)))
+    if not os.path.exists(os.path.join(DATA_DIR, cart_file(user))):
+        return []
+    return list(load_file(cart_file(user)).get("items", []))
+
+def load_menu():
+    return load_file("menu_items.txt")
+
+def save_cart(user, cart):
+    migrate_legacy_carts()
+    if use_sqlite():
+        sqlite_store.save_cart(user, cart)
+        return
+    if not cart:
+        write_queue.flush(os.path.join(DATA_DIR, cart_file(user)))
+        if os.path.exists(os.path.join(DATA_DIR, cart_file(user))):
+            os.remove(os.path.join(DATA_DIR, cart_file(user)))
+        return
+    os.makedirs(os.path.join(DATA_DIR, CARTS_DIR), exist_ok=True)
+    save_to_file({"user": user, "items": cart}, cart_file(user))
 
 def load_all_orders():
-    try:
-        with open("data/current_active_orders.txt", "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+    return load_file("current_active_orders.txt")
 
 def save_order(order_data):
-    os.makedirs("data", exist_ok=True)
-    all_orders = load_all_orders()
     order_id = next(iter(order_data))
-    if 'cart_contents' in order_data[order_id]:
-        order_data[order_id]['customizations'] = order_data[order_id]['cart_contents']
-    all_orders[order_id] = order_data[order_id]
-
-    with open("data/current_active_orders.txt", "w") as f:
-        json.dump(all_orders, f, indent=4)
+    save_record("current_active_orders.txt", order_id, order_data[order_id])
+    index_orders([(order_data[order_id]["system_user"], order_id, ACTIVE)])
+    publish_status(order_id, order_data[order_id], order_data[order_id]["status"])
 
 def display_cart(cart):
     if not cart:
@@ -249,11 +281,18 @@ def customize_item(menu_item, full_menu=None, is_combo_part=False, component_id=
 
     return item
 
-def checkout(current_user, cart):
+def checkout(current_user, cart, menu_items):
     if not cart:
         print("Cannot checkout - cart is empty!")
         return False
 
+    # Stock may have run out since the items were added
+    shortages = cart_shortages([line_from_cart_item(item, menu_items) for item in cart], menu_items)
+    if shortages:
+        names = ", ".join(ingredient for ingredient, _, _ in shortages)
+        print(f"Cannot checkout - not enough {names} left. Please remove some items.")
+        return False
+
     display_cart(cart)
 
     total = sum(item['price'] * item['quantity'] for item in cart)
@@ -271,14 +310,7 @@ def checkout(current_user, cart):
         print("Invalid choice. Please enter 1 or 2.")
         order_type = input("Order type (1 for Dine-In, 2 for Takeaway): ").strip()
 
-    counters = load_order_counters()
-    if order_type == "1":
-        order_id = f"D{counters['dine_in']:02d}"
-        counters['dine_in'] += 1
-    else:
-        order_id = f"T{counters['take_away']:02d}"
-        counters['take_away'] += 1
-    save_order_counters(counters)
+    order_id = allocate_order_id("dine_in" if order_type == "1" else "take_away")
 
     table_num = ""
     if order_type == "1":
@@ -289,7 +321,14 @@ def checkout(current_user, cart):
 
     remarks = input("Enter order remarks (optional): ").strip()
 
-    existing_orders = load_all_orders()
+    lines = [line_from_cart_item(item, menu_items) for item in cart]
+
+    # Holds the ingredients until checkout, so another kiosk cannot sell the same stock
+    shortages = reserve_ingredients(order_id, ingredient_usage(lines, menu_items))
+    if shortages:
+        names = ", ".join(ingredient for ingredient, _, _ in shortages)
+        print(f"Sorry, {names} ran out while you were ordering. Please update your cart.")
+        return False
     
     order_data = {
         order_id: {
@@ -297,9 +336,7 @@ def checkout(current_user, cart):
             "display_name": customer_name,
             "type": "Dine-In" if order_type == "1" else "Takeaway",
             "table_number": table_num,
-            "items": [[item['id'], item['quantity'], item.get('remarks', '')] for item in cart],
-            "item_details": {item['id']: item['name'] for item in cart},
-            "cart_contents": [item for item in cart],
+            "lines": [line_to_dict(line) for line in lines],
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "remarks": remarks,
             "status": "Pending"
@@ -312,23 +349,19 @@ def checkout(current_user, cart):
     print(f"Order ID: {order_id}")
     print(f"Customer: {customer_name}")
     print("Items:")
-    for item_id, qty, item_remarks in order_data[order_id]['items']:
-        print(f"  - {item_id} x{qty}" + (f" (Remarks: {item_remarks})" if item_remarks else ""))
+    for line in order_data[order_id]['lines']:
+        print(f"  - {line['code']} x{line['quantity']}" + (f" (Remarks: {line['remark']})" if line['remark'] else ""))
     print(f"Remarks: {remarks if remarks else 'None'}")
 
     save_cart(current_user, [])
+    write_queue.flush()
     return True
 
 def cart_management(current_user, menu):
-    menu = load_file("menu_items.txt")
     if not current_user:
         print("Please login first")
         return current_user
 
-    for item_id in menu:
-        if 'price' in menu[item_id]:
-            menu[item_id]['price'] = menu[item_id]['price']
-
     cart = load_cart(current_user)
 
     while True:
@@ -349,19 +382,29 @@ def cart_management(current_user, menu):
             for item_id, item in menu.items():
                 categories.setdefault(item['category'], []).append((item_id, item))
 
+            availability = get_availability(menu)
             for category, items in categories.items():
                 print(f"\n{category.upper()}")
                 for item_id, item in items:
-                    print(f"{item_id}. {item['name']} - RM{item['price']:.2f}")
+                    sold_out = " [SOLD OUT]" if availability.get(item_id) == 0 else ""
+                    print(f"{item_id}. {item['name']} - RM{item['price']:.2f}{sold_out}")
 
             item_id = input("\nEnter item ID: ").strip().upper()
-            if item_id in menu:
-                item_data = {'id': item_id, **menu[item_id]}
-                cart.append(customize_item(item_data, menu))
-                save_cart(current_user, cart)
-                print("Item added to cart!")
-            else:
+            if item_id not in menu:
                 print("Invalid item ID!")
+            elif is_sold_out(menu, item_id):
+                print(f"Sorry, {menu[item_id]['name']} is sold out.")
+            else:
+                item_data = {'id': item_id, **menu[item_id]}
+                new_item = customize_item(item_data, menu)
+                shortages = cart_shortages([line_from_cart_item(item, menu) for item in cart + [new_item]], menu)
+                if shortages:
+                    names = ", ".join(ingredient for ingredient, _, _ in shortages)
+                    print(f"Sorry, not enough {names} left for this. Item not added.")
+                else:
+                    cart.append(new_item)
+                    save_cart(current_user, cart)
+                    print("Item added to cart!")
 
         elif choice == "2":
             if not cart:
@@ -395,7 +438,7 @@ def cart_management(current_user, menu):
                 print("Please enter a valid number!")
 
         elif choice == "4":
-            if checkout(current_user, cart):
+            if checkout(current_user, cart, menu):
                 return current_user
 
         elif choice == "5":
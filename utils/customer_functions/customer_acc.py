@@ -1,35 +1,7 @@
-def load_customers():
-    customers = {}
-    try:
-        with open("data/users.txt", "r") as f:
-            for line in f:
-                line = line.strip()
-                if not line or ":" not in line:
-                    continue
-                parts = line.split(":", 2)
-                if len(parts) != 3:
-                    continue
-                username, pwd, role = parts
-                customers[username] = {"password": pwd, "role": role}
-    except FileNotFoundError:
-        import os
-        os.makedirs("data", exist_ok=True)
-        with open("data/users.txt", "a"):
-            pass
-    return customers
-
-
-def save_customers(customers):
-    import os
-    os.makedirs("data", exist_ok=True)
-    with open("data/users.txt", "w") as f:
-        for username, data in customers.items():
-            f.write(f"{username}:{data['password']}:{data['role']}\n")
+from utils.accounts import load_accounts, add_account, authenticate
 
 
 def customer_account_management(current_user):
-    customers = load_customers()
-
     while True:
         print("\n=== ACCOUNT MANAGEMENT ===")
         print(f"Current user: {current_user or 'Not logged in'}")
@@ -49,7 +21,7 @@ def customer_account_management(current_user):
             if " " in username:
                 print("Username cannot contain spaces!")
                 continue
-            if username in customers:
+            if username in load_accounts():
                 print("Username already exists!")
                 continue
 
@@ -62,8 +34,9 @@ def customer_account_management(current_user):
                 continue
 
             # Всегда регистрируем как customer
-            customers[username] = {"password": password, "role": "customer"}
-            save_customers(customers)
+            if not add_account(username, password, "customer"):
+                print("Username already exists!")
+                continue
             print("Registration successful!")
             return username
 
@@ -75,7 +48,7 @@ def customer_account_management(current_user):
             username = input("Username: ").strip()
             password = input("Password: ").strip()
 
-            if username in customers and customers[username]["password"] == password:
+            if authenticate(username, password):
                 print("Login successful!")
                 return username
             else:
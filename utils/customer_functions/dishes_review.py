@@ -1,3 +1,7 @@
+from utils.helpers import atomic_write
+from utils.catalogue import get_catalogue, resolve_dish
+
+
 def load_reviews():
     reviews = []
     try:
@@ -17,9 +21,9 @@ def load_reviews():
 
 
 def save_reviews(reviews):
-    with open("data/review.txt", "w") as f:
-        for review in reviews:
-            f.write(f"{review['user']}|||{review['dish']}|||{review['comment']}|||{review['rating']}\n")
+    atomic_write("data/review.txt", "".join(
+        f"{review['user']}|||{review['dish']}|||{review['comment']}|||{review['rating']}\n" for review in reviews
+    ))
 
 
 def dishes_review(current_user):
@@ -44,7 +48,13 @@ def dishes_review(current_user):
         choice = input("Choose (1-3): ")
 
         if choice == "1":
-            dish = input("Dish name: ").strip()
+            dish = input("Dish name or code: ").strip()
+            code = resolve_dish(dish)
+            if code is None:
+                print("Unknown dish! Please use a name or code from the menu.")
+                continue
+            # Stored under the menu's own spelling, so reviews of one dish group together
+            dish = get_catalogue()['dishes'][code]['name']
             comment = input("Your review: ").strip()
             while True:
                 rating = input("Rating (1-5): ").strip()
@@ -1,26 +1,16 @@
-import json
-
-def load_orders(username):
-    try:
-        with open("data/current_active_orders.txt", "r") as f:
-            content = f.read().strip()
-            if not content:
-                return {}
-            all_orders = json.loads(content)
-            return {
-                order_id: order
-                for order_id, order in all_orders.items()
-                if order.get("system_user") == username  
-            }
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+from utils.helpers import wait_for_command
+from utils.models import order_lines
+from utils.order_events import event_cursor, read_events
+from utils.user_orders import load_user_orders
 
 def order_tracking(current_user):
     if not current_user:
         print("Please login first")
         return current_user
 
-    orders = load_orders(current_user)
+    # Taken before loading, so changes made while the history is shown are not missed
+    cursor = event_cursor()
+    orders = load_user_orders(current_user)
 
     if not orders:
         print("\nNo orders found for your account!")
@@ -31,56 +21,82 @@ def order_tracking(current_user):
         print(f"\nOrder ID: {order_id}")
         print(f"Date: {order['timestamp']}")
         print(f"Type: {order['type']}")
-        if order['type'] == "Dine-In":
+        if order['type'] == "Dine-In" and order.get('table_number'):
             print(f"Table: {order['table_number']}")
+        print(f"Status: {order.get('status', 'Pending')}")
 
         print("Items:")
-        for item_id, qty, item_remarks in order['items']:
-            output = f"  - {item_id} x{qty}"
+        lines = order_lines(order)
+        for line in lines:
+            output = f"  - {line.code} x{line.quantity}"
 
-            # Show item name and customizations if available
-            if 'item_details' in order and item_id in order['item_details']:
-                item_name = order['item_details'][item_id]
-                if '+' in item_name:
-                    base_name = item_name.split('+')[0]
-                    add_ons = item_name.split('+')[1:]
-                    output += f" ({base_name} with: {', '.join(add_ons)})"
-                else:
-                    output += f" ({item_name})"
+            # Show item name and customizations
+            if line.modifiers:
+                output += f" ({line.base_name} with: {', '.join(line.modifiers)})"
+            else:
+                output += f" ({line.name})"
 
-            if item_remarks:
-                output += f" (Remarks: {item_remarks})"
+            if line.remark:
+                output += f" (Remarks: {line.remark})"
 
             print(output)
 
-        if 'cart_contents' in order:
+        combos = [line for line in lines if line.contents]
+        if combos:
             print("\nDetailed Customizations:")
-            for item in order['cart_contents']:
-                if item.get('type') == 'combo' and 'contents' in item:
-                    print(f"\n{item['name']} contains:")
-                    for comp_id, components in item['contents'].items():
-                        if isinstance(components, list):
-                            for component in components:
-                                if component.get('customizations'):
-                                    custom = component['customizations']
-                                    name = custom.get('name', 'Item')
-                                    if '+' in name:
-                                        base, *addons = name.split('+')
-                                        print(f"  - {base.strip()} with: {', '.join(addons)}")
-                                    else:
-                                        print(f"  - {name}")
-                        elif isinstance(components, dict) and components.get('customizations'):
-                            custom = components['customizations']
-                            name = custom.get('name', 'Item')
-                            if '+' in name:
-                                base, *addons = name.split('+')
-                                print(f"  - {base.strip()} with: {', '.join(addons)}")
-                            else:
-                                print(f"  - {name}")
+            for line in combos:
+                print(f"\n{line.name} contains:")
+                for comp_id, components in line.contents.items():
+                    if isinstance(components, list):
+                        for component in components:
+                            if component.get('customizations'):
+                                custom = component['customizations']
+                                name = custom.get('name', 'Item')
+                                if '+' in name:
+                                    base, *addons = name.split('+')
+                                    print(f"  - {base.strip()} with: {', '.join(addons)}")
+                                else:
+                                    print(f"  - {name}")
+                    elif isinstance(components, dict) and components.get('customizations'):
+                        custom = components['customizations']
+                        name = custom.get('name', 'Item')
+                        if '+' in name:
+                            base, *addons = name.split('+')
+                            print(f"  - {base.strip()} with: {', '.join(addons)}")
+                        else:
+                            print(f"  - {name}")
 
         if order.get('remarks'):
             print(f"\nOrder Remarks: {order['remarks']}")
         print("-" * 40)
 
-    input("\nPress Enter to continue...")
-    return current_user
\ No newline at end of file
+    choice = input("\nPress Enter to continue or 'w' to watch live status updates: ").strip().lower()
+    if choice == "w":
+        watch_orders(current_user, orders, cursor)
+    return current_user
+
+def watch_orders(current_user, orders, cursor):
+    statuses = {order_id: order.get('status', 'Pending') for order_id, order in orders.items()}
+    print("\n=== LIVE ORDER STATUS ===")
+    for order_id, status in statuses.items():
+        print(f"  {order_id:12} {status}")
+
+    updates = []
+    def changed():
+        # Only the events appended since the last check are read
+        nonlocal cursor
+        events, cursor = read_events(cursor)
+        updates.extend(event for event in events if event.get('system_user') == current_user)
+        return bool(updates)
+
+    while wait_for_command("\nWatching for updates, press Enter to stop: ", changed) is None:
+        for event in updates:
+            order_id, status = event['order_id'], event['status']
+            if statuses.get(order_id) == status:
+                continue
+            if order_id in statuses:
+                print(f"  {event['timestamp'][11:]} Order {order_id}: {statuses[order_id]} -> {status}")
+            else:
+                print(f"  {event['timestamp'][11:]} New order {order_id}: {status}")
+            statuses[order_id] = status
+        updates.clear()
\ No newline at end of file
@@ -1,9 +1,13 @@
+from utils.inventory import get_availability
+
 def display_menu_by_category(menu, category):
     print(f"\n=== {category.upper()} ===")
+    availability = get_availability(menu)
     for item_id, item in menu.items():
         if item.get('category') == category:
             price = item.get('base_price', item.get('price', 0))
-            print(f"\n{item_id}. {item['name']} - RM{price:.2f}")
+            sold_out = " [SOLD OUT]" if availability.get(item_id) == 0 else ""
+            print(f"\n{item_id}. {item['name']} - RM{price:.2f}{sold_out}")
 
             if 'contents' in item and item['contents']:
                 print("   Includes:")
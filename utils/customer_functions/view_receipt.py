@@ -1,32 +1,27 @@
 def view_receipt(current_user):
-    import json, os
-
-    path = os.path.join("data", "current_active_orders.txt")
-    if not os.path.exists(path):
-        print("No orders found.")
-        return
-
-    with open(path, "r") as f:
-        orders = json.load(f)
+    from utils.models import order_lines
+    from utils.user_orders import load_user_orders
 
+    orders = load_user_orders(current_user)
     found = False
-    for order_id, order in orders.items():
+    for order_id, order in sorted(orders.items(), key=lambda x: x[1]['timestamp']):
         if order.get('system_user') == current_user:
             found = True
             print(f"\n=== RECEIPT for {current_user} ===")
             print(f"Order ID: {order_id}")
             print(f"Date: {order['timestamp']}")
             print(f"Type: {order['type']}")
-            if order['type'] == "Dine-In":
+            if order['type'] == "Dine-In" and order.get('table_number'):
                 print(f"Table: {order['table_number']}")
             print("Items:")
             total = 0
-            for item in order['cart_contents']:
-                subtotal = item['price'] * item['quantity']
-                total += subtotal
-                remarks = f" (Remarks: {item['remarks']})" if item['remarks'] else ""
-                print(f" - {item['name']} x{item['quantity']} RM{subtotal:.2f}{remarks}")
+            for line in order_lines(order):
+                total += line.total
+                remarks = f" (Remarks: {line.remark})" if line.remark else ""
+                print(f" - {line.name} x{line.quantity} RM{line.total:.2f}{remarks}")
             print(f"Total: RM{total:.2f}")
+            if 'payment_method' in order:
+                print(f"Paid: RM{order['total'] + order.get('tax', 0):.2f} by {order['payment_method']}")
             print(f"Status: {order['status']}")
             print(f"Order Remarks: {order.get('remarks', 'None')}")
     if not found:
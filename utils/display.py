@@ -1,6 +1,7 @@
-from datetime import datetime
-from utils.helpers import calculate_custom_price
-from utils.helpers import load_file
+from datetime import datetime, timedelta
+from utils.helpers import combo_content_lines, calculate_totals
+from utils.helpers import load_file, iter_transactions
+from utils.aggregates import load_period_aggregate
 
 def show_menu(menu_items):
     print(f"\n{'=' * 80}")
@@ -41,70 +42,23 @@ def view_order_details(header, order_id, order, menu_items):
     print(f"{'Item':<45} {'Qty':^10} {'Price':>10} {'Total':>10}")
     print("-" * 80)
     
-    subtotal = 0
-    for item in order.get("items", []):
-        item_code = item[0]
-        qty = item[1]
-        remark = item[2] if len(item) > 2 else ""
-        
-        item_data = menu_items.get(item_code, {})
-        item_name = item_data.get('name', f'Unknown Item ({item_code})')
-        
-        # Handle customized items
-        if "item_details" in order and item_code in order["item_details"]:
-            item_name = order["item_details"][item_code]
-            price = calculate_custom_price(item_code, order["item_details"][item_code], menu_items, order)
-        elif "cart_contents" in order and any(c['id'] == item_code for c in order["cart_contents"]):
-            # For combo items, use the price from item_details if available
-            customized_desc = next(
-                (c['custom_description'] for c in order["cart_contents"] 
-                if c['id'] == item_code and 'custom_description' in c),
-                None
-            )
-            if customized_desc:
-                price = calculate_custom_price(item_code, customized_desc, menu_items)
-            else:
-                price = item_data.get('price', 0)
-        else:
-            price = item_data.get('price', 0)
-        
-        line_total = qty * price
-        subtotal += line_total
-        
-        print(f"{item_name:<45} {f'x{qty}':^10} RM{price:>9.2f} RM{line_total:>9.2f}")
-        if remark:
-            print(f"  Remark: {remark}")
-        
-        if (item_code in menu_items and 'contents' in menu_items[item_code] and "cart_contents" in order and any(c['id'] == item_code for c in order["cart_contents"])):
+    totals = calculate_totals(order_id, order, menu_items)
+    for line in totals['lines']:
+        qty = f"x{line.quantity}"
+        print(f"{line.name:<45} {qty:^10} RM{line.unit_price:>9.2f} RM{line.total:>9.2f}")
+        if line.remark:
+            print(f"  Remark: {line.remark}")
+
+        if line.contents:
             print(f"  {'Combo Contents:':<43}")
-            for content in order["cart_contents"]:
-                if content['id'] == item_code and 'contents' in content:
-                    for content_code, content_data in content['contents'].items():
-                        if isinstance(content_data, list):
-                            for custom_item in content_data:
-                                if custom_item.get('customizations'):
-                                    custom_name = custom_item['customizations'].get('name', 
-                                        menu_items.get(content_code, {}).get('name', f'Unknown ({content_code})'))
-                                    print(f"    - {custom_name} x{custom_item.get('quantity', 1)}")
-                                else:
-                                    content_name = menu_items.get(content_code, {}).get('name', f'Unknown ({content_code})')
-                                    print(f"    - {content_name} x{content_data[0].get('quantity', 1)}")
-                        elif content_data.get('customizations'):
-                            custom_name = content_data['customizations'].get('name', 
-                                menu_items.get(content_code, {}).get('name', f'Unknown ({content_code})'))
-                            print(f"    - {custom_name} x{content_data.get('quantity', 1)}")
-                        else:
-                            content_name = menu_items.get(content_code, {}).get('name', f'Unknown ({content_code})')
-                            print(f"    - {content_name} x{content_data.get('quantity', 1)}")
+            for content_line in combo_content_lines(line.contents, menu_items):
+                print(content_line)
     # Discounts
-    total_discount = 0
-    if order.get('discounts'):
+    if totals['discount_details']:
         print("-" * 80)
         print(f"{'Discounts Applied:':<80}")
-        for discount in order['discounts']:
-            amount = discount.get('amount', 0)
-            total_discount += amount
-            print(f"- {discount.get('description', 'Discount'):<66}-RM{amount:>9.2f}")
+        for discount in totals['discount_details']:
+            print(f"- {discount.get('description', 'Discount'):<66}-RM{discount['amount']:>9.2f}")
     
     # Order remarks
     if order.get("remarks"):
@@ -112,37 +66,54 @@ def view_order_details(header, order_id, order, menu_items):
     
     # Totals
     print("=" * 80)
-    print(f"{'Subtotal:':<68} RM{subtotal:>9.2f}")
-    if total_discount > 0:
-        print(f"{'Discounts:':<67} -RM{total_discount:>9.2f}")
+    print(f"{'Subtotal:':<68} RM{totals['subtotal']:>9.2f}")
+    if totals['total_discount'] > 0:
+        print(f"{'Discounts:':<67} -RM{totals['total_discount']:>9.2f}")
         print("-" * 80)
     
-    taxable_amount = max(0, subtotal - total_discount)
-    tax = taxable_amount * 0.06
-    print(f"{'Tax (6%):':<68} RM{tax:>9.2f}")
-    print(f"{'TOTAL:':<68} RM{(taxable_amount + tax):>9.2f}")
+    print(f"{'Tax (6%):':<68} RM{totals['tax']:>9.2f}")
+    print(f"{'TOTAL:':<68} RM{totals['grand_total']:>9.2f}")
     print("=" * 80)
 
 
-def daily_sales_report(transactions, menu_items):
+def sales_report_menu(menu_items):
+    today = datetime.now()
+    print("\nReport Period:")
+    print("1. Today")
+    print("2. Last 7 Days")
+    print("3. Month to Date")
+    choice = input("Select an option: ").strip()
+
+    if choice == "1":
+        daily_sales_report(menu_items)
+    elif choice == "2":
+        daily_sales_report(menu_items, (today - timedelta(days=6)).strftime("%Y-%m-%d"))
+    elif choice == "3":
+        daily_sales_report(menu_items, today.strftime("%Y-%m-01"))
+    else:
+        print("Invalid choice.")
+
+def daily_sales_report(menu_items, start_day=None, end_day=None):
+    today = datetime.now().strftime("%Y-%m-%d")
+    start_day = start_day or today
+    end_day = end_day or today
+    title = "DAILY SALES REPORT" if start_day == end_day else "SALES REPORT"
+
     print(f"\n{'=' * 80}")
-    print(f"{'DAILY SALES REPORT':^{80}}")
+    print(f"{title:^{80}}")
     print(f"{'=' * 80}")
-    
-    today = datetime.now().strftime("%Y-%m-%d")
-    print(f"\nDate: {today}")
-    
-    # Filter transactions for today only
-    today_transactions = {
-        order_id: trans for order_id, trans in transactions.items() 
-        if trans.get('timestamp', '').startswith(today)
-    }
-    
-    if not today_transactions:
-        print("\nNo transactions found for today!")
+
+    if start_day == end_day:
+        print(f"\nDate: {start_day}")
+    else:
+        print(f"\nPeriod: {start_day} to {end_day}")
+
+    # Summary figures come from the running per-day counters kept at checkout
+    report_data = _calculate_report_data(load_period_aggregate(start_day, end_day))
+
+    if not report_data['order_count']:
+        print("\nNo transactions found for this period!")
         return
-    # Calculate report data
-    report_data = _calculate_report_data(today_transactions, menu_items)
     
     # Financial summary
     print(f"\n{'-' * 80}")
@@ -200,8 +171,10 @@ def daily_sales_report(transactions, menu_items):
     print(header)
     print("-" * 80)
     
-    transactions_list = list(today_transactions.items())  
-    for i, (order_id, trans) in enumerate(transactions_list, 1):
+    # Only the partitions inside the period are read, one transaction at a time
+    order_ids = []
+    for i, (order_id, trans) in enumerate(iter_transactions(start_day, end_day), 1):
+        order_ids.append(order_id)
         row = (
             f"[{i}]:".ljust(8) + " " +
             order_id.ljust(16) + " " +  
@@ -219,8 +192,8 @@ def daily_sales_report(transactions, menu_items):
             break
         try:
             idx = int(choice) - 1
-            if 0 <= idx < len(transactions_list):
-                order_id = transactions_list[idx][0]
+            if 0 <= idx < len(order_ids):
+                order_id = order_ids[idx]
                 receipt_file = f"receipts/receipt_{order_id}.txt"
                 try:
                     with open(receipt_file, "r") as f:
@@ -233,68 +206,13 @@ def daily_sales_report(transactions, menu_items):
         except ValueError:
             print("Please enter a valid number or 'done'")
 
-def _calculate_report_data(transactions, d):
-    # Payment breakdown
-    payment_types = {
-        'cash': {'total': 0, 'count': 0},
-        'card': {'total': 0, 'count': 0},
-        "touch 'n go": {'total': 0, 'count': 0}
-    }
-    
-    # Initialize other metrics
-    total_sales = 0
-    total_discounts = 0
-    item_sales = {}
-    dine_in_count = 0
-    dine_in_total = 0
-    take_away_count = 0
-    take_away_total = 0
-
-    for order_id, transaction in transactions.items():
-        # Update totals
-        total_sales += transaction['total']
-        total_discounts += sum(d['amount'] for d in transaction.get('discounts', []))
-        
-        # Normalize payment method for comparison
-        payment_method = transaction.get('payment_method', '').lower()
-        if "card" in payment_method:
-            payment_types['card']['total'] += transaction['total']
-            payment_types['card']['count'] += 1
-        elif "cash" in payment_method:
-            payment_types['cash']['total'] += transaction['total']
-            payment_types['cash']['count'] += 1
-        elif "touch" in payment_method.lower() or "n go" in payment_method.lower():
-            payment_types["touch 'n go"]['total'] += transaction['total']
-            payment_types["touch 'n go"]['count'] += 1
-        
-        # Update item sales
-        for item in transaction.get('items', []):
-            item_code = item[0]
-            qty = item[1]
-            item_sales[item_code] = item_sales.get(item_code, 0) + qty
-        
-        # Normalize order type for comparison
-        order_type = transaction.get('type', '').lower()
-        if "dine" in order_type:  # Matches "Dine-In" or "Dine In"
-            dine_in_count += 1
-            dine_in_total += transaction['total']
-        else:  # Assume anything else is takeaway
-            take_away_count += 1
-            take_away_total += transaction['total']
-    
+def _calculate_report_data(aggregate):
     return {
-        'total_sales': total_sales,
-        'total_discounts': total_discounts,
-        'order_count': len(transactions),
-        'payment_types': payment_types,
-        'dine_in': {
-            'count': dine_in_count,
-            'total': dine_in_total
-        },
-        'take_away': {
-            'count': take_away_count,
-            'total': take_away_total
-        },
-        'top_items': sorted(item_sales.items(), key=lambda x: x[1], reverse=True)[:5]
+        'total_sales': aggregate['total_sales'],
+        'total_discounts': aggregate['total_discounts'],
+        'order_count': aggregate['order_count'],
+        'payment_types': aggregate['payment_types'],
+        'dine_in': aggregate['dine_in'],
+        'take_away': aggregate['take_away'],
+        'top_items': sorted(aggregate['item_sales'].items(), key=lambda x: x[1], reverse=True)[:5]
     }
- 
\ No newline at end of file
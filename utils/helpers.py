@@ -1,93 +1,695 @@
 import json
 import os
+import select
+import shutil
+import sys
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
 from datetime import datetime
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+from utils import sqlite_store, write_queue
+from utils.models import order_lines
+
+DATA_DIR = "data"
+# "json" keeps the pretty-printed text files under data/, "sqlite" uses data/restaurant.db
+STORAGE_BACKEND = os.environ.get("RESTAURANT_STORAGE", "json")
+JOURNAL_SUFFIX = ".journal"
+# Snapshots with this suffix hold one upsert record per line and can be streamed
+JSONL_SUFFIX = ".jsonl"
+# Fold the journal back into the snapshot once it grows past this many bytes
+JOURNAL_COMPACT_BYTES = 64 * 1024
+
+# "pretty" writes indented JSON, "compact" writes minified JSON and stores order
+# fields that can be rebuilt from cart_contents as {"_dedup": "cart_contents"}
+STORAGE_FORMAT = os.environ.get("RESTAURANT_FORMAT", "pretty")
+DEDUP_MARKER = "_dedup"
+DERIVED_FIELDS = {
+    "customizations": lambda cart: cart,
+    "item_details": lambda cart: {item['id']: item['name'] for item in cart},
+    "items": lambda cart: [[item['id'], item['quantity'], item.get('remarks', '')] for item in cart],
+}
+
+BACKUP_SUFFIX = ".bak"
+LOCK_SUFFIX = ".lock"
+# Seconds between checks for new data while waiting for a command
+POLL_SECONDS = 1.0
+
+# Other terminals are kept out by an OS lock on <path>.lock, other threads of this
+# process by an RLock; the depth lets locked helpers call each other
+_thread_locks = defaultdict(threading.RLock)
+_held_locks = {}
+
+@contextmanager
+def file_lock(path):
+    lock_path = path + LOCK_SUFFIX
+    with _thread_locks[lock_path]:
+        if lock_path in _held_locks:
+            _held_locks[lock_path][1] += 1
+        else:
+            _held_locks[lock_path] = [acquire_os_lock(lock_path), 1]
+        try:
+            yield
+        finally:
+            _held_locks[lock_path][1] -= 1
+            if not _held_locks[lock_path][1]:
+                release_os_lock(_held_locks.pop(lock_path)[0])
+
+def acquire_os_lock(lock_path):
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    f = open(lock_path, "a+")
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            # LK_LOCK retries for about 10 seconds before raising
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+def release_os_lock(f):
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        f.close()
+
+def data_lock(file):
+    return file_lock(os.path.join(DATA_DIR, file))
+
+def atomic_write(path, text, backup=False):
+    # Write a temp file next to the target, fsync it and rename it over the target,
+    # so readers and crashes only ever see the old or the new complete file
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if backup and os.path.exists(path):
+            keep_backup(path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    fsync_directory(directory)
+
+def keep_backup(path):
+    # Hard link the current generation to <path>.bak without copying it
+    temp_path = f"{path}{BACKUP_SUFFIX}.tmp"
+    try:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        os.link(path, temp_path)
+    except OSError:
+        shutil.copy2(path, temp_path)
+    os.replace(temp_path, path + BACKUP_SUFFIX)
+
+def fsync_directory(directory):
+    # Makes the rename itself durable; not supported on Windows
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def journal_path(file):
+    return os.path.join(DATA_DIR, file + JOURNAL_SUFFIX)
+
+def iter_records(path):
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield decode_record(line)
+            except json.JSONDecodeError:
+                # A crash mid-append leaves a partial last line, skip it
+                continue
+
+def decode_record(line):
+    record = json.loads(line)
+    if "value" in record:
+        unpack_value(record["value"])
+    return record
+
+def replay_journal(file, data):
+    try:
+        for record in iter_records(journal_path(file)):
+            apply_journal_record(data, record)
+    except FileNotFoundError:
+        pass
+    return data
+
+def apply_journal_record(data, record):
+    op = record.get("op")
+    key = record.get("key")
+    # A reader can briefly see a new snapshot next to the old journal; records the
+    # snapshot already holds a later revision of are skipped
+    current = data.get(key)
+    if isinstance(current, dict) and current.get("revision", 0):
+        if op == "upsert" and isinstance(record["value"], dict):
+            if record["value"].get("revision", 0) < current["revision"]:
+                return
+        elif op.startswith("discount_") and record.get("revision", 0) <= current["revision"]:
+            return
+    if op == "upsert":
+        data[key] = record["value"]
+    elif op == "delete":
+        data.pop(key, None)
+    elif op == "discount_add" and key in data:
+        discounts = data[key].setdefault("discounts", [])
+        # Replaying over a snapshot that already holds the discount must not duplicate it
+        if record["value"] not in discounts:
+            discounts.append(record["value"])
+    elif op == "discount_remove" and key in data:
+        if record["value"] in data[key].get("discounts", []):
+            data[key]["discounts"].remove(record["value"])
+    if op.startswith("discount_") and key in data and "revision" in record:
+        data[key]["revision"] = record["revision"]
+
+def use_sqlite():
+    return STORAGE_BACKEND == "sqlite"
+
+# Parsed files reused until the data on disk changes: (file, loader) -> (version, data)
+_file_cache = {}
+
+def file_version(paths):
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+def cached_load(file, loader, paths):
+    # Callers share the returned dict, so anything they mutate must be written back
+    version = file_version(paths)
+    cached = _file_cache.get((file, loader))
+    if cached and cached[0] == version:
+        return cached[1]
+    data = loader(file)
+    _file_cache[(file, loader)] = (version, data)
+    return data
+
+def invalidate_cache(file=None):
+    if file is None:
+        _file_cache.clear()
+        return
+    for key in [key for key in _file_cache if key[0] == file]:
+        del _file_cache[key]
 
 def load_file(file):
+    if use_sqlite():
+        return cached_load(file, sqlite_store.load_table, [sqlite_store.DB_FILE])
+    return load_cached_text_file(file)
+
+def load_file_if_exists(file):
+    # {} without the "not found" message for a file nothing has been saved to yet
+    if not use_sqlite():
+        write_queue.flush(os.path.join(DATA_DIR, file))
+        if not any(os.path.exists(path) for path in text_file_paths(file)):
+            return {}
+    return load_file(file)
+
+def data_version(file):
+    # Changes whenever anything is written to file, without reading it
+    if use_sqlite():
+        return file_version([sqlite_store.DB_FILE])
+    return file_version(text_file_paths(file))
+
+def load_cached_text_file(file):
+    return cached_load(file, load_text_file, text_file_paths(file))
+
+def text_file_paths(file):
+    return [os.path.join(DATA_DIR, file), journal_path(file)]
+
+def load_committed(file):
+    return load_text_file(file)
+
+def committed_state(file):
+    # Private copy of what is on disk for revision checks, never handed to callers
+    return cached_load(file, load_committed, text_file_paths(file))
+
+def record_revision(file, key):
+    # None once the record has been deleted
+    if use_sqlite():
+        row = sqlite_store.load_row(file, key)
+    else:
+        row = committed_state(file).get(key)
+    if row is None:
+        return None
+    return row.get("revision", 0)
+
+@contextmanager
+def write_batch():
+    # On sqlite the writes made inside are one commit. The text files cannot commit several
+    # files at once, so callers keep each write safe to repeat after an interrupted batch.
+    if not use_sqlite():
+        yield
+        return
+    try:
+        with sqlite_store.transaction():
+            yield
+    except BaseException:
+        # Anything cached inside the batch may have been rolled back
+        invalidate_cache()
+        raise
+
+def save_to_file(data, file):
+    with data_lock(file):
+        if use_sqlite():
+            sqlite_store.save_table(data, file)
+        else:
+            save_text_file(data, file)
+        invalidate_cache(file)
+
+def load_text_file(file):
+    path = os.path.join(DATA_DIR, file)
+    write_queue.flush(path)
     try:
-        with open(os.path.join("data", file), "r") as f:
-            content = f.read().strip()
-            if not content:
-                return {}
-            return json.loads(content)
+        data = read_snapshot(file, path)
     except FileNotFoundError:
-        print(f"Error: {file} not found.")
-        return {}
+        if not os.path.exists(journal_path(file)):
+            print(f"Error: {file} not found.")
+            return {}
+        data = {}
     except json.JSONDecodeError as e:
-        print(f"Error in {file}: {e}.")
-        return {}
+        if not os.path.exists(path + BACKUP_SUFFIX):
+            print(f"Error in {file}: {e}.")
+            return {}
+        print(f"Error in {file}: {e}. Loading the previous version from {file}{BACKUP_SUFFIX}.")
+        data = read_snapshot(file, path + BACKUP_SUFFIX)
+    return replay_journal(file, data)
 
-def save_to_file(data, file):
+def read_snapshot(file, path):
+    if not file.endswith(JSONL_SUFFIX):
+        data = read_json(path)
+        for value in data.values():
+            unpack_value(value)
+        return data
+    data = {}
+    for record in iter_records(path):
+        apply_journal_record(data, record)
+    return data
+
+def dumps(data):
+    if STORAGE_FORMAT == "compact":
+        return json.dumps(data, separators=(",", ":"))
+    return json.dumps(data, indent=4)
+
+def encode_record(record):
+    if STORAGE_FORMAT != "compact":
+        return json.dumps(record)
+    if "value" in record:
+        record = {**record, "value": pack_value(record["value"])}
+    return json.dumps(record, separators=(",", ":"))
+
+def serialize_snapshot(file, data):
+    if file.endswith(JSONL_SUFFIX):
+        return "".join(encode_record({"op": "upsert", "key": key, "value": value}) + "\n" for key, value in data.items())
+    if STORAGE_FORMAT == "compact":
+        data = {key: pack_value(value) for key, value in data.items()}
+    return dumps(data)
+
+def pack_value(value):
+    # Orders and transactions carry the cart three times over; keep only cart_contents
+    if not isinstance(value, dict) or not isinstance(value.get("cart_contents"), list):
+        return value
+    packed = value
+    for field, derive in DERIVED_FIELDS.items():
+        if field not in value:
+            continue
+        try:
+            derived = derive(value["cart_contents"])
+        except (KeyError, TypeError):
+            return value
+        if value[field] == derived:
+            if packed is value:
+                packed = dict(value)
+            packed[field] = {DEDUP_MARKER: "cart_contents"}
+    return packed
+
+def unpack_value(value):
+    # Expands packed fields whatever STORAGE_FORMAT is set to now
+    if isinstance(value, dict):
+        for field, derive in DERIVED_FIELDS.items():
+            if isinstance(value.get(field), dict) and DEDUP_MARKER in value[field]:
+                value[field] = derive(value["cart_contents"])
+    return value
+
+def iter_text_records(file):
+    # Streams the (key, value) pairs of a .jsonl file. Only the journal, which compaction
+    # keeps under JOURNAL_COMPACT_BYTES, and the snapshot records it touches are held in memory.
+    if not file.endswith(JSONL_SUFFIX):
+        yield from load_text_file(file).items()
+        return
+    path = os.path.join(DATA_DIR, file)
+    write_queue.flush(path)
+    try:
+        journal = list(iter_records(journal_path(file)))
+    except FileNotFoundError:
+        journal = []
+    touched = {record.get("key") for record in journal}
+    latest = {}
+    try:
+        for record in iter_records(path):
+            if record["key"] in touched:
+                latest[record["key"]] = record["value"]
+            else:
+                yield record["key"], record["value"]
+    except FileNotFoundError:
+        pass
+    for record in journal:
+        apply_journal_record(latest, record)
+    yield from latest.items()
+
+def read_json(path):
+    with open(path, "r") as f:
+        content = f.read().strip()
+        return json.loads(content) if content else {}
+
+def save_text_file(data, file):
+    # Serialised now and written by the background writer; load_text_file waits for it
+    text = serialize_snapshot(file, data)
+    path = os.path.join(DATA_DIR, file)
+    with data_lock(file):
+        journal = journal_position(file)
+        invalidate_cache(file)
+    write_queue.submit(path, lambda: file_lock(path), lambda: write_snapshot(file, text, journal))
+
+def write_snapshot(file, text, journal):
     try:
-        with open(os.path.join("data", file), "w") as f:
-            json.dump(data, f, indent=4)
+        with data_lock(file):
+            atomic_write(os.path.join(DATA_DIR, file), text, backup=True)
+            trim_journal(file, journal)
+            invalidate_cache(file)
     except IOError as e:
         print(f"Error saving file: {e}")
 
-def load_order_counters():
+def journal_position(file):
     try:
-        with open("data/order_counters.txt", "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {"dine_in": 1, "take_away": 1}
+        stat = os.stat(journal_path(file))
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size)
+
+def trim_journal(file, journal):
+    # Drop the records the snapshot was built from. Anything appended after `journal`
+    # was taken, or to a journal recreated since, is newer and stays to be replayed.
+    current = journal_position(file)
+    if journal is None or current is None or current[0] != journal[0]:
+        return
+    with open(journal_path(file), "r") as f:
+        f.seek(journal[1])
+        newer = f.read()
+    if newer:
+        atomic_write(journal_path(file), newer)
+    else:
+        os.remove(journal_path(file))
+
+def append_journal(file, records):
+    try:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with data_lock(file):
+            before = file_version(text_file_paths(file))
+            lines = [encode_record(record) for record in records]
+            with open(journal_path(file), "a") as f:
+                f.write("".join(line + "\n" for line in lines))
+            _file_cache.pop((file, load_text_file), None)
+            committed = _file_cache.pop((file, load_committed), None)
+            if committed and committed[0] == before:
+                # Nobody else wrote since it was read, so the private copy only needs these records
+                for line in lines:
+                    apply_journal_record(committed[1], decode_record(line))
+                _file_cache[(file, load_committed)] = (file_version(text_file_paths(file)), committed[1])
+            if os.path.getsize(journal_path(file)) >= JOURNAL_COMPACT_BYTES:
+                compact_file(file)
+    except IOError as e:
+        print(f"Error saving file: {e}")
+
+def compact_file(file):
+    # Runs under the journal lock, so the snapshot covers the whole journal
+    write_snapshot(file, serialize_snapshot(file, load_text_file(file)), journal_position(file))
+
+def write_record(file, record, base_revision=None):
+    # base_revision is the revision the caller's copy had before the change. If another
+    # terminal has written the record since then nothing is written and False is returned.
+    with data_lock(file):
+        if base_revision is not None and record_revision(file, record["key"]) != base_revision:
+            return False
+        if not use_sqlite():
+            append_journal(file, [record])
+            return True
+        if record["op"] == "upsert":
+            sqlite_store.upsert_row(file, record["key"], record["value"])
+        elif record["op"] == "delete":
+            sqlite_store.delete_row(file, record["key"])
+        else:
+            # Discount records patch a single order row
+            row = sqlite_store.load_row(file, record["key"])
+            if row is not None:
+                data = {record["key"]: row}
+                apply_journal_record(data, record)
+                sqlite_store.upsert_row(file, record["key"], data[record["key"]])
+        invalidate_cache(file)
+    return True
+
+def write_records(file, records):
+    # Upserts and deletes written together: one journal append or one sqlite transaction
+    with data_lock(file):
+        if not use_sqlite():
+            append_journal(file, records)
+            return
+        sqlite_store.write_rows(file, [(record["key"], record["value"]) for record in records if record["op"] == "upsert"],
+                                [record["key"] for record in records if record["op"] == "delete"])
+        invalidate_cache(file)
+
+def save_record(file, key, value, base_revision=None):
+    return write_record(file, {"op": "upsert", "key": key, "value": value}, base_revision)
+
+def delete_record(file, key, base_revision=None):
+    return write_record(file, {"op": "delete", "key": key}, base_revision)
+
+def add_discount_record(file, order_id, discount, revision):
+    return write_record(file, {"op": "discount_add", "key": order_id, "value": discount, "revision": revision},
+                        revision - 1)
+
+def remove_discount_record(file, order_id, discount, revision):
+    return write_record(file, {"op": "discount_remove", "key": order_id, "value": discount, "revision": revision},
+                        revision - 1)
+
+TRANSACTIONS_DIR = "transactions"
+LEGACY_TRANSACTIONS_FILE = "transactions.txt"
+
+def transaction_partition(day):
+    return f"{TRANSACTIONS_DIR}/{day}{JSONL_SUFFIX}"
+
+def transaction_days():
+    try:
+        names = os.listdir(os.path.join(DATA_DIR, TRANSACTIONS_DIR))
+    except FileNotFoundError:
+        return []
+    return sorted({name.split(".")[0] for name in names
+                   if name.endswith(JSONL_SUFFIX) or name.endswith(JSONL_SUFFIX + JOURNAL_SUFFIX)})
+
+def partition_legacy_transactions():
+    # One-off split of the old single transactions.txt into per-day partitions
+    legacy_path = os.path.join(DATA_DIR, LEGACY_TRANSACTIONS_FILE)
+    if not os.path.exists(legacy_path):
+        return
+    with data_lock(LEGACY_TRANSACTIONS_FILE):
+        # Another terminal may have finished the split while we waited
+        if not os.path.exists(legacy_path):
+            return
+        by_day = {}
+        for order_id, transaction in load_text_file(LEGACY_TRANSACTIONS_FILE).items():
+            day = transaction.get("timestamp", "")[:10] or "unknown"
+            by_day.setdefault(day, {})[order_id] = transaction
+        os.makedirs(os.path.join(DATA_DIR, TRANSACTIONS_DIR), exist_ok=True)
+        for day, transactions in by_day.items():
+            partition = transaction_partition(day)
+            with data_lock(partition):
+                if os.path.exists(os.path.join(DATA_DIR, partition)) or os.path.exists(journal_path(partition)):
+                    transactions = {**transactions, **load_text_file(partition)}
+                write_snapshot(partition, serialize_snapshot(partition, transactions), journal_position(partition))
+        os.replace(legacy_path, legacy_path + ".migrated")
+
+def load_partitioned_transactions(start_day=None, end_day=None):
+    partition_legacy_transactions()
+    transactions = {}
+    for day in transaction_days():
+        if (start_day and day < start_day) or (end_day and day > end_day):
+            continue
+        transactions.update(load_cached_text_file(transaction_partition(day)))
+    return transactions
+
+def iter_transactions(start_day=None, end_day=None):
+    # Yields (order_id, transaction) one at a time, for reports over the whole history;
+    # days are "%Y-%m-%d" strings and both ends of the range are inclusive
+    if use_sqlite():
+        yield from sqlite_store.iter_transactions_between(start_day or "", f"{end_day} 99" if end_day else "9999")
+        return
+    partition_legacy_transactions()
+    for day in transaction_days():
+        if (start_day and day < start_day) or (end_day and day > end_day):
+            continue
+        yield from iter_text_records(transaction_partition(day))
+
+def load_transaction(order_id, day):
+    # Reads only the partition of the day the order was checked out
+    if use_sqlite():
+        return sqlite_store.load_row(LEGACY_TRANSACTIONS_FILE, order_id)
+    partition_legacy_transactions()
+    return load_cached_text_file(transaction_partition(day)).get(order_id)
+
+def save_transactions(transactions):
+    if use_sqlite():
+        write_records(LEGACY_TRANSACTIONS_FILE, [{"op": "upsert", "key": order_id, "value": transaction}
+                                                 for order_id, transaction in transactions.items()])
+        invalidate_cache()
+        return
+    partition_legacy_transactions()
+    by_partition = {}
+    for order_id, transaction in transactions.items():
+        by_partition.setdefault(transaction_partition(transaction["timestamp"][:10]), []).append(
+            {"op": "upsert", "key": order_id, "value": transaction})
+    for partition, records in by_partition.items():
+        write_records(partition, records)
+
+ORDER_COUNTERS_FILE = "order_counters.txt"
+ORDER_ID_PREFIXES = {"dine_in": "D", "take_away": "T"}
+# Minimum digits in an order number, longer numbers just grow
+ORDER_ID_WIDTH = int(os.environ.get("RESTAURANT_ORDER_ID_WIDTH", "3"))
+# "never" keeps counting up, "daily" restarts at 1 each day with the date in the id
+ORDER_ID_RESET = os.environ.get("RESTAURANT_ORDER_ID_RESET", "never")
+# Numbers each terminal reserves at a time; unused ones are skipped when it exits
+ORDER_ID_BLOCK = int(os.environ.get("RESTAURANT_ORDER_ID_BLOCK", "10"))
+
+# order type -> [period, next number, end of reserved block]
+_order_id_blocks = {}
+_order_id_lock = threading.Lock()
+
+def load_order_counters():
+    path = os.path.join(DATA_DIR, ORDER_COUNTERS_FILE)
+    for candidate in (path, path + BACKUP_SUFFIX):
+        try:
+            with open(candidate, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+    return {"dine_in": 1, "take_away": 1}
 
 def save_order_counters(counters):
-    os.makedirs("data", exist_ok=True)
-    with open("data/order_counters.txt", "w") as f:
-        json.dump(counters, f, indent=4)
-        
-def calculate_custom_price(item_code, item_description, menu_items, order=None):
-    if item_code not in menu_items:
-        return 0
-    
-    # For combo items
-    if 'contents' in menu_items[item_code]:  
-        if order and 'cart_contents' in order:
-            for item in order['cart_contents']:
-                if isinstance(item, dict) and item.get('id') == item_code:
-                    addons_total = 0
-                    for content_code, content_data in item.get('contents', {}).items():
-                        if isinstance(content_data, list):
-                            for custom_item in content_data:
-                                if custom_item and isinstance(custom_item, dict) and custom_item.get('customizations'):
-                                    base_price = menu_items.get(content_code, {}).get('price', 0)
-                                    custom_price = custom_item['customizations'].get('price', base_price)
-                                    quantity = custom_item.get('quantity', 1)
-                                    addons_total += (custom_price - base_price) * quantity
-                    return menu_items[item_code]['price'] + addons_total
-        return menu_items[item_code]['price']
-    
-    # For regular items with add-ons
-    if "+" in item_description:
-        total_price = menu_items[item_code]['price']
-        customizations = [c.strip() for c in item_description.split("+")[1:]]
-        
-        if 'ingredients' in menu_items[item_code]:
-            for ingredient in customizations:
-                if ingredient in menu_items[item_code]['ingredients']:
-                    total_price += menu_items[item_code]['ingredients'][ingredient]['price']
-        return total_price
-    
-    return menu_items[item_code]['price']
-    
+    atomic_write(os.path.join(DATA_DIR, ORDER_COUNTERS_FILE), dumps(counters), backup=True)
+
+def order_id_period():
+    return datetime.now().strftime("%Y-%m-%d") if ORDER_ID_RESET == "daily" else ""
+
+def reserve_order_ids(order_type, period, count):
+    with data_lock(ORDER_COUNTERS_FILE):
+        counters = load_order_counters()
+        if counters.get("period", "") != period:
+            counters = {"dine_in": 1, "take_away": 1, "period": period}
+        start = counters.get(order_type, 1)
+        counters[order_type] = start + count
+        save_order_counters(counters)
+    return start
+
+def format_order_id(order_type, period, number):
+    prefix = ORDER_ID_PREFIXES[order_type]
+    if period:
+        prefix += period[2:].replace("-", "") + "-"
+    return f"{prefix}{number:0{ORDER_ID_WIDTH}d}"
+
+def allocate_order_id(order_type):
+    # The counters file is only locked once per block; ids within a block come from memory
+    period = order_id_period()
+    while True:
+        with _order_id_lock:
+            block = _order_id_blocks.get(order_type)
+            if block is None or block[0] != period or block[1] >= block[2]:
+                start = reserve_order_ids(order_type, period, ORDER_ID_BLOCK)
+                block = _order_id_blocks[order_type] = [period, start, start + ORDER_ID_BLOCK]
+            number = block[1]
+            block[1] += 1
+        order_id = format_order_id(order_type, period, number)
+        # Guards against a counters file restored from an old backup
+        if record_revision("current_active_orders.txt", order_id) is None:
+            return order_id
+
+def combo_content_lines(contents, menu_items):
+    lines = []
+    for content_code, content_data in contents.items():
+        default_name = menu_items.get(content_code, {}).get('name', f'Unknown ({content_code})')
+        entries = content_data if isinstance(content_data, list) else [content_data]
+        for custom_item in entries:
+            if not custom_item or not isinstance(custom_item, dict):
+                continue
+            name = default_name
+            if custom_item.get('customizations'):
+                name = custom_item['customizations'].get('name', default_name)
+            lines.append(f"    - {name} x{custom_item.get('quantity', 1)}")
+    return lines
+
+# Totals per order id, reused while the order revision and the menu are unchanged;
+# the least recently priced orders are dropped past TOTALS_CACHE_SIZE
+TOTALS_CACHE_SIZE = 256
+_totals_cache = OrderedDict()
+
+def bump_revision(order):
+    order["revision"] = order.get("revision", 0) + 1
+    return order["revision"]
 
 def calculate_order_total(order_id, current_orders, menu_items):
-    order = current_orders[order_id]
-    subtotal = 0
-    item_totals = {}
+    return calculate_totals(order_id, current_orders[order_id], menu_items)
 
-    for item in order["items"]:
-        item_code = item[0]
-        qty = item[1]
-        
-        # Get base price or customized price
-        if "item_details" in order and item_code in order["item_details"]:
-            price = calculate_custom_price(item_code, order["item_details"][item_code], menu_items)
-        else:
-            price = menu_items[item_code]['price']
-            
-        item_total = price * qty
-        item_totals[item_code] = item_total
-        subtotal += item_total
+def calculate_totals(order_id, order, menu_items):
+    revision = order.get("revision", 0)
+    cached = _totals_cache.get(order_id)
+    if cached and cached[0] == revision and cached[1] is menu_items:
+        _totals_cache.move_to_end(order_id)
+        return cached[2]
+    totals = compute_totals(order, menu_items)
+    _totals_cache[order_id] = (revision, menu_items, totals)
+    _totals_cache.move_to_end(order_id)
+    if len(_totals_cache) > TOTALS_CACHE_SIZE:
+        _totals_cache.popitem(last=False)
+    return totals
+
+def compute_totals(order, menu_items):
+    lines = order_lines(order, menu_items)
+    item_totals = {}
+    subtotal = 0
+    for line in lines:
+        item_totals[line.code] = item_totals.get(line.code, 0) + line.total
+        subtotal += line.total
 
     total = subtotal
     discount_details = []
@@ -119,10 +721,16 @@ def calculate_order_total(order_id, current_orders, menu_items):
                     'amount': discount_amount
                 })
 
+    taxable_amount = max(0, total)
+    tax = taxable_amount * 0.06
     return {
+        'lines': lines,
         'subtotal': subtotal,
         'total': total,
         'discount_details': discount_details,
+        'total_discount': subtotal - total,
+        'tax': tax,
+        'grand_total': taxable_amount + tax,
         'item_totals': item_totals
     }
 
@@ -155,72 +763,23 @@ def generate_receipt_lines(order_id, order, payment_method, menu_items):
     lines.append(f"{'Item':<45} {'Qty':^10} {'Price':>10} {'Total':>10}")
     lines.append("-" * 80)
     
-    subtotal = 0
-    for item in order.get("items", []):
-        item_code = item[0]
-        qty = item[1]
-        remark = item[2] if len(item) > 2 else ""
-        
-        item_data = menu_items.get(item_code, {})
-        item_name = item_data.get('name', f'Unknown Item ({item_code})')
-        
-        # Handle customized items
-        if "item_details" in order and item_code in order["item_details"]:
-            item_name = order["item_details"][item_code]
-            price = calculate_custom_price(item_code, order["item_details"][item_code], menu_items, order)
-        elif "cart_contents" in order and any(c['id'] == item_code for c in order["cart_contents"]):
-
-            customized_desc = next(
-                (c['custom_description'] for c in order["cart_contents"] 
-                if c['id'] == item_code and 'custom_description' in c),
-                None
-            )
-            if customized_desc:
-                price = calculate_custom_price(item_code, customized_desc, menu_items, order)
-            else:
-                price = item_data.get('price', 0)
-        else:
-            price = item_data.get('price', 0)
-        
-        line_total = qty * price
-        subtotal += line_total
-        
-        lines.append(f"{item_name:<45} {f'x{qty}':^10} RM{price:>9.2f} RM{line_total:>9.2f}")
-        if remark:
-            lines.append(f"  Remark: {remark}")
-        
-        if (item_code in menu_items and 'contents' in menu_items[item_code] and 
-            "cart_contents" in order and any(c['id'] == item_code for c in order["cart_contents"])):
+    totals = calculate_totals(order_id, order, menu_items)
+    for line in totals['lines']:
+        qty = f"x{line.quantity}"
+        lines.append(f"{line.name:<45} {qty:^10} RM{line.unit_price:>9.2f} RM{line.total:>9.2f}")
+        if line.remark:
+            lines.append(f"  Remark: {line.remark}")
+
+        if line.contents:
             lines.append(f"  {'Combo Contents:':<43}")
-            for content in order["cart_contents"]:
-                if content['id'] == item_code and 'contents' in content:
-                    for content_code, content_data in content['contents'].items():
-                        if isinstance(content_data, list):
-                            for custom_item in content_data:
-                                if custom_item and isinstance(custom_item, dict) and custom_item.get('customizations'):
-                                    custom_name = custom_item['customizations'].get('name', 
-                                        menu_items.get(content_code, {}).get('name', f'Unknown ({content_code})'))
-                                    lines.append(f"    - {custom_name} x{custom_item.get('quantity', 1)}")
-                                elif custom_item:
-                                    content_name = menu_items.get(content_code, {}).get('name', f'Unknown ({content_code})')
-                                    lines.append(f"    - {content_name} x{custom_item.get('quantity', 1)}")
-                        elif content_data and isinstance(content_data, dict) and content_data.get('customizations'):
-                            custom_name = content_data['customizations'].get('name', 
-                                menu_items.get(content_code, {}).get('name', f'Unknown ({content_code})'))
-                            lines.append(f"    - {custom_name} x{content_data.get('quantity', 1)}")
-                        elif content_data:
-                            content_name = menu_items.get(content_code, {}).get('name', f'Unknown ({content_code})')
-                            lines.append(f"    - {content_name} x{content_data.get('quantity', 1)}")
+            lines.extend(combo_content_lines(line.contents, menu_items))
     
     # Discounts
-    total_discount = 0
-    if order.get('discounts'):
+    if totals['discount_details']:
         lines.append("-" * 80)
         lines.append(f"{'Discounts Applied:':<80}")
-        for discount in order['discounts']:
-            amount = discount.get('amount', 0)
-            total_discount += amount
-            lines.append(f"- {discount.get('description', 'Discount'):<66}-RM{amount:>9.2f}")
+        for discount in totals['discount_details']:
+            lines.append(f"- {discount.get('description', 'Discount'):<66}-RM{discount['amount']:>9.2f}")
     
     # Order remarks
     if order.get("remarks"):
@@ -228,34 +787,46 @@ def generate_receipt_lines(order_id, order, payment_method, menu_items):
     
     # Totals
     lines.append("=" * 80)
-    lines.append(f"{'Subtotal:':<68} RM{subtotal:>9.2f}")
-    if total_discount > 0:
-        lines.append(f"{'Discounts:':<67} -RM{total_discount:>9.2f}")
+    lines.append(f"{'Subtotal:':<68} RM{totals['subtotal']:>9.2f}")
+    if totals['total_discount'] > 0:
+        lines.append(f"{'Discounts:':<67} -RM{totals['total_discount']:>9.2f}")
         lines.append("-" * 80)
     
-    taxable_amount = max(0, subtotal - total_discount)
-    tax = taxable_amount * 0.06
-    lines.append(f"{'Tax (6%):':<68} RM{tax:>9.2f}")
-    lines.append(f"{'TOTAL:':<68} RM{(taxable_amount + tax):>9.2f}")
+    lines.append(f"{'Tax (6%):':<68} RM{totals['tax']:>9.2f}")
+    lines.append(f"{'TOTAL:':<68} RM{totals['grand_total']:>9.2f}")
     lines.append("=" * 80)
     
     return lines
 
-def generate_receipt(order_id, order, payment_method, menu_items):
+def generate_receipt(order_id, order, payment_method, menu_items, show=True):
     try:
         os.makedirs("receipts", exist_ok=True)
         receipt_lines = generate_receipt_lines(order_id, order, payment_method, menu_items)
         receipt_text = "\n".join(receipt_lines)
         
-        print(f"\n{receipt_text}")
+        if show:
+            print(f"\n{receipt_text}")
         
         filename = f"receipt_{order_id}.txt"
         filepath = os.path.join("receipts", filename)
-        with open(filepath, "w") as f:
-            f.write(receipt_text)
+        atomic_write(filepath, receipt_text)
             
-        print(f"Receipt saved to {filepath}")
+        if show:
+            print(f"Receipt saved to {filepath}")
         return filepath
     except Exception as e:
         print(f"Error generating receipt: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def wait_for_command(prompt, changed):
+    # Returns the typed command, or None as soon as changed() reports new data
+    if os.name == "nt" or not sys.stdin.isatty():
+        return input(prompt)
+    print(prompt, end="", flush=True)
+    while True:
+        ready, _, _ = select.select([sys.stdin], [], [], POLL_SECONDS)
+        if ready:
+            return sys.stdin.readline().rstrip("\n")
+        if changed():
+            print()
+            return None
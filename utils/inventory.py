@@ -0,0 +1,228 @@
+from array import array
+import os
+from utils import write_queue
+from utils.helpers import DATA_DIR, load_file, save_to_file, write_records, data_lock, load_file_if_exists
+from utils.models import modifiers_from_name
+from utils.catalogue import INVENTORY_FILE, RECIPE_FILE, get_catalogue, ingredient_id
+# order_id -> ingredients held for an order not yet checked out, plus the running total
+RESERVATIONS_FILE = "stock_reservations.txt"
+RESERVED_KEY = "reserved"
+
+# Ingredient vectors for the menu and recipes currently in use; load_file hands back
+# the same dicts until either file changes, so identity is enough to spot a new version
+_compiled_vectors = {"menu": None, "recipes": None, "vectors": None}
+
+def add_vector(total, vector, times=1):
+    for ingredient, qty in vector.items():
+        total[ingredient] = total.get(ingredient, 0) + qty * times
+
+def compile_ingredient_vectors(menu_items, recipes, dishes):
+    # code -> {'base': {ingredient: qty} for one serving, 'addons': {"Bacon": {"bacon": 1}}}
+    vectors = {}
+    for code, item in menu_items.items():
+        base = {}
+        for ingredient in recipes.get(dishes[code]['recipe'], []):
+            add_vector(base, {ingredient_id(ingredient): 1})
+        vectors[code] = {
+            'base': base,
+            'addons': {name: {ingredient_id(name): 1} for name in item.get('ingredients', {})}
+        }
+    # Combos are the sum of their standard components
+    for code, item in menu_items.items():
+        if 'contents' in item:
+            base = {}
+            for component, qty in item['contents'].items():
+                add_vector(base, vectors.get(component, {}).get('base', {}), qty)
+            vectors[code]['base'] = base
+    return vectors
+
+def get_ingredient_vectors(menu_items):
+    recipes = load_file(RECIPE_FILE)
+    if _compiled_vectors["menu"] is not menu_items or _compiled_vectors["recipes"] is not recipes:
+        _compiled_vectors["menu"] = menu_items
+        _compiled_vectors["recipes"] = recipes
+        _compiled_vectors["vectors"] = compile_ingredient_vectors(menu_items, recipes, get_catalogue(menu_items)['dishes'])
+    return _compiled_vectors["vectors"]
+
+def add_item_usage(usage, vectors, code, modifiers, times):
+    entry = vectors.get(code)
+    if entry is None:
+        return
+    add_vector(usage, entry['base'], times)
+    for modifier in modifiers:
+        add_vector(usage, entry['addons'].get(modifier, {}), times)
+
+def add_line_usage(usage, vectors, line):
+    if not line.contents:
+        add_item_usage(usage, vectors, line.code, line.modifiers, line.quantity)
+        return
+    # Combo contents as chosen in the cart: swapped drinks and customised burgers
+    for component, content in line.contents.items():
+        for part in content if isinstance(content, list) else [content]:
+            if not isinstance(part, dict):
+                continue
+            times = part.get('quantity', 1) * line.quantity
+            custom = part.get('customizations')
+            if not custom:
+                add_item_usage(usage, vectors, component, [], times)
+            elif custom.get('substituted_id'):
+                add_item_usage(usage, vectors, custom['substituted_id'], [], times)
+            else:
+                add_item_usage(usage, vectors, custom.get('id', component), modifiers_from_name(custom.get('name', '')), times)
+
+def ingredient_usage(lines, menu_items, usage=None):
+    # Adds up the ingredients of every line; pass usage to add several orders together
+    usage = {} if usage is None else usage
+    vectors = get_ingredient_vectors(menu_items)
+    for line in lines:
+        add_line_usage(usage, vectors, line)
+    return usage
+
+# Menu code -> servings the stock allows (None when no tracked ingredient limits it),
+# updated only for the codes using an ingredient whose count changed
+_availability = {"vectors": None, "inventory": {}, "counts": {}, "users": {}}
+
+def makeable_count(vector, inventory):
+    counts = [int(max(0, inventory[ingredient]) // qty) for ingredient, qty in vector.items()
+              if qty and ingredient in inventory]
+    return min(counts) if counts else None
+
+def get_availability(menu_items):
+    vectors = get_ingredient_vectors(menu_items)
+    inventory = available_stock()
+    state = _availability
+    if state["vectors"] is not vectors:
+        users = {}
+        for code, entry in vectors.items():
+            for ingredient in entry['base']:
+                users.setdefault(ingredient, set()).add(code)
+        state["users"] = users
+        state["counts"] = {code: makeable_count(entry['base'], inventory) for code, entry in vectors.items()}
+    else:
+        previous = state["inventory"]
+        changed = [ingredient for ingredient in set(previous) | set(inventory)
+                   if previous.get(ingredient) != inventory.get(ingredient)]
+        for code in set().union(*(state["users"].get(ingredient, ()) for ingredient in changed)):
+            state["counts"][code] = makeable_count(vectors[code]['base'], inventory)
+    state["vectors"] = vectors
+    state["inventory"] = inventory
+    return state["counts"]
+
+def is_sold_out(menu_items, code):
+    return get_availability(menu_items).get(code) == 0
+
+def cart_shortages(cart_lines, menu_items):
+    # Ingredients the whole cart needs beyond what is in stock: [(ingredient, need, available)]
+    inventory = available_stock()
+    usage = ingredient_usage(cart_lines, menu_items)
+    return [(ingredient, need, inventory[ingredient]) for ingredient, need in usage.items()
+            if ingredient in inventory and need > inventory[ingredient]]
+
+def deduct_ingredients(usage):
+    if not usage:
+        return
+    with data_lock(INVENTORY_FILE):
+        inventory = dict(load_file(INVENTORY_FILE))
+        for ingredient, qty in usage.items():
+            if ingredient in inventory:
+                inventory[ingredient] = max(0, inventory[ingredient] - qty)
+        save_to_file(inventory, INVENTORY_FILE)
+        # Written before the lock is released, so the next checkout reads these counts
+        write_queue.flush(os.path.join(DATA_DIR, INVENTORY_FILE))
+
+def load_reservations():
+    # No ledger until the first order reserves stock
+    return load_file_if_exists(RESERVATIONS_FILE)
+
+def reserved_stock():
+    return load_reservations().get(RESERVED_KEY, {})
+
+def available_stock():
+    # Inventory less what placed orders are holding
+    reserved = reserved_stock()
+    return {ingredient: qty - reserved.get(ingredient, 0) for ingredient, qty in load_file(INVENTORY_FILE).items()}
+
+def reserve_ingredients(order_id, usage):
+    # Holds usage for order_id; returns [(ingredient, need, available)] and holds nothing if short
+    with data_lock(RESERVATIONS_FILE):
+        ledger = load_reservations()
+        reserved = dict(ledger.get(RESERVED_KEY, {}))
+        # Reserving again for the same order replaces its earlier hold
+        add_vector(reserved, ledger.get(order_id, {}), -1)
+        inventory = load_file(INVENTORY_FILE)
+        held = {ingredient: qty for ingredient, qty in usage.items() if ingredient in inventory}
+        shortages = [(ingredient, qty, inventory[ingredient] - reserved.get(ingredient, 0))
+                     for ingredient, qty in held.items() if reserved.get(ingredient, 0) + qty > inventory[ingredient]]
+        if shortages:
+            return shortages
+        add_vector(reserved, held)
+        write_records(RESERVATIONS_FILE, [{"op": "upsert", "key": order_id, "value": held},
+                                          {"op": "upsert", "key": RESERVED_KEY, "value": reserved}])
+        return []
+
+def release_reservations(order_ids):
+    # Only the ingredients of these orders are touched, not every active order
+    with data_lock(RESERVATIONS_FILE):
+        ledger = load_reservations()
+        held = [order_id for order_id in order_ids if order_id in ledger and order_id != RESERVED_KEY]
+        if not held:
+            return
+        reserved = dict(ledger.get(RESERVED_KEY, {}))
+        for order_id in held:
+            add_vector(reserved, ledger[order_id], -1)
+        reserved = {ingredient: qty for ingredient, qty in reserved.items() if qty > 0}
+        write_records(RESERVATIONS_FILE, [{"op": "delete", "key": order_id} for order_id in held]
+                      + [{"op": "upsert", "key": RESERVED_KEY, "value": reserved}])
+
+def held_orders(order_ids):
+    # The orders of order_ids still holding a reservation
+    ledger = load_reservations()
+    return [order_id for order_id in order_ids if order_id in ledger and order_id != RESERVED_KEY]
+
+def consume_reservations(order_ids, usage):
+    # Checkout: held stock becomes a deduction under the ledger lock, so a reservation
+    # never sees it counted as both held and gone
+    with data_lock(RESERVATIONS_FILE):
+        deduct_ingredients(usage)
+        release_reservations(order_ids)
+
+def build_stock_plan(recipes, inventory):
+    # Recipe x ingredient matrix as one sparse row per recipe (column indexes and
+    # quantities in parallel arrays), plus the stock as a vector over the same columns
+    ingredients = sorted({ingredient_id(ingredient) for needed in recipes.values() for ingredient in needed}
+                         | {ingredient_id(ingredient) for ingredient in inventory})
+    column = {ingredient: idx for idx, ingredient in enumerate(ingredients)}
+    rows = []
+    for needed in recipes.values():
+        counts = {}
+        for ingredient in needed:
+            idx = column[ingredient_id(ingredient)]
+            counts[idx] = counts.get(idx, 0) + 1
+        rows.append((array('l', counts.keys()), array('l', counts.values())))
+    on_hand = {ingredient_id(ingredient): qty for ingredient, qty in inventory.items()}
+    stock = array('d', (max(0, on_hand.get(ingredient, 0)) for ingredient in ingredients))
+    return {'recipes': list(recipes), 'ingredients': ingredients, 'rows': rows, 'stock': stock}
+
+def max_servings(plan):
+    # [(recipe, servings, limiting ingredient)]; a recipe without ingredients has no limit
+    stock = plan['stock']
+    results = []
+    for recipe, (columns, needs) in zip(plan['recipes'], plan['rows']):
+        if not columns:
+            results.append((recipe, None, None))
+            continue
+        servings, idx = min((int(stock[col] // need), col) for col, need in zip(columns, needs))
+        results.append((recipe, servings, plan['ingredients'][idx]))
+    return results
+
+def prep_shortages(plan, prep_list):
+    # prep_list is {recipe: servings}; returns [(ingredient, need, available, missing)]
+    rows = dict(zip(plan['recipes'], plan['rows']))
+    total = array('d', [0]) * len(plan['ingredients'])
+    for recipe, servings in prep_list.items():
+        columns, needs = rows[recipe]
+        for col, need in zip(columns, needs):
+            total[col] += need * servings
+    stock = plan['stock']
+    return [(plan['ingredients'][col], total[col], stock[col], total[col] - stock[col])
+            for col in range(len(total)) if total[col] > stock[col]]
@@ -0,0 +1,45 @@
+from bisect import bisect_left, insort
+from utils.models import order_lines
+
+KITCHEN_STATUSES = ("Pending", "Preparing", "Served")
+# Tickets in these statuses are listed with their items
+OPEN_STATUSES = ("Pending", "Preparing")
+
+def queue_key(order_id, order):
+    # Timestamps are "%Y-%m-%d %H:%M:%S", so string order is arrival order
+    return (order.get('timestamp', ''), order_id)
+
+def build_status_index(orders):
+    # status -> [(timestamp, order_id)] kept sorted, oldest ticket first
+    index = {status: [] for status in KITCHEN_STATUSES}
+    for order_id, order in orders.items():
+        index.setdefault(order.get('status', 'Pending'), []).append(queue_key(order_id, order))
+    for entries in index.values():
+        entries.sort()
+    return index
+
+def index_move(index, order_id, order, old_status):
+    # order already carries its new status; only the two affected lists are touched
+    key = queue_key(order_id, order)
+    entries = index.get(old_status, [])
+    pos = bisect_left(entries, key)
+    if pos < len(entries) and entries[pos] == key:
+        del entries[pos]
+    insort(index.setdefault(order.get('status', 'Pending'), []), key)
+
+def queued_tickets(index):
+    statuses = list(KITCHEN_STATUSES) + [status for status in index if status not in KITCHEN_STATUSES]
+    return [(status, order_id) for status in statuses for _, order_id in index.get(status, [])]
+
+def ticket_lines(number, order_id, order):
+    header = f"[{number}] {order_id:<12} {order.get('timestamp', '')[11:]:<9} {order.get('type', ''):<9}"
+    if order.get('table_number'):
+        header += f" Table {order['table_number']}"
+    status = order.get('status', 'Pending')
+    lines = [f"{header}{status:>{80 - len(header)}}"]
+    if status in OPEN_STATUSES:
+        for line in order_lines(order):
+            lines.append(f"      {line.quantity} x {line.name}" + (f"  ({line.remark})" if line.remark else ""))
+        if order.get('remarks'):
+            lines.append(f"      Note: {order['remarks']}")
+    return lines
@@ -1,7 +1,8 @@
 import os
-import json
-
-PROMO_FILE = os.path.join("data", "promo_codes.txt")
+from utils.helpers import load_file, save_record, delete_record, atomic_write
+from utils.accounts import load_accounts, add_account, remove_account
+from utils.aggregates import load_all_time_aggregate
+from utils.models import order_lines
 
 def load_lines_from_file(filename, default=[]):
     filepath = os.path.join("data", filename)
@@ -11,23 +12,7 @@ def load_lines_from_file(filename, default=[]):
         return [line.strip() for line in file.readlines() if line.strip()]
 
 def load_users():
-    filepath = os.path.join("data", "users.txt")
-    users = []
-    if not os.path.exists(filepath):
-        return users
-    with open(filepath, "r", encoding="utf-8") as file:
-        for line in file:
-            line = line.strip()
-            if line and ":" in line:
-                username, password, role = line.split(":", 2)
-                users.append({"username": username, "password": password, "role": role})
-    return users
-
-def save_users(users):
-    filepath = os.path.join("data", "users.txt")
-    with open(filepath, "w", encoding="utf-8") as file:
-        for user in users:
-            file.write(f"{user['username']}:{user['password']}:{user['role']}\n")
+    return [{"username": username, "role": data["role"]} for username, data in load_accounts().items()]
 
 def manage_user_accounts():
     while True:
@@ -53,19 +38,17 @@ def manage_user_accounts():
             if not username or not password or not role:
                 print("All fields are required.")
                 continue
-            if any(u['username'] == username for u in users):
+            if not add_account(username, password, role):
                 print("Username already exists.")
                 continue
-            users.append({"username": username, "password": password, "role": role})
-            save_users(users)
             print("User added successfully.")
 
         elif choice == "2":
             try:
                 index = int(input("Enter the number of the user to delete: "))
                 if 1 <= index <= len(users):
-                    removed = users.pop(index - 1)
-                    save_users(users)
+                    removed = users[index - 1]
+                    remove_account(removed['username'])
                     print(f"User '{removed['username']}' deleted.")
                 else:
                     print("Invalid user number.")
@@ -80,27 +63,10 @@ def manage_user_accounts():
 
 def save_lines_to_file(filename, lines):
     filepath = os.path.join("data", filename)
-    with open(filepath, "w", encoding="utf-8") as file:
-        for line in lines:
-            file.write(line.strip() + "\n")
+    atomic_write(filepath, "".join(line.strip() + "\n" for line in lines))
             
 def view_all_orders():
-    orders_file = os.path.join("data", "current_active_orders.txt")
-    if not os.path.exists(orders_file):
-        print("No orders found.")
-        return
-
-    try:
-        with open(orders_file, "r") as f:
-            content = f.read().strip()
-            if not content:
-                print("No orders found.")
-                return
-            all_orders = json.loads(content)
-    except json.JSONDecodeError:
-        print("Error reading orders.")
-        return
-
+    all_orders = load_file("current_active_orders.txt")
     if not all_orders:
         print("No orders found.")
         return
@@ -112,8 +78,8 @@ def view_all_orders():
         print(f"Order Type: {order.get('type')}")
         print(f"Table Number: {order.get('table_number', 'N/A')}")
         print("Items:")
-        for item in order.get("cart_contents", []):
-            print(f"  - {item['name']} x{item['quantity']} (RM{item['price']:.2f})")
+        for line in order_lines(order):
+            print(f"  - {line.name} x{line.quantity} (RM{line.unit_price:.2f})")
 
         promo_code = order.get("promo_code")
         if promo_code:
@@ -126,48 +92,21 @@ def view_all_orders():
         print(f"Status: {order.get('status')}")
         
 def track_finances():
-    orders_file = os.path.join("data", "current_active_orders.txt")
-    if not os.path.exists(orders_file):
-        print("No orders found.")
+    finances = load_all_time_aggregate()
+    if not finances['order_count']:
+        print("No completed orders found.")
         return
 
-    try:
-        with open(orders_file, "r") as f:
-            all_orders = json.load(f)
-    except json.JSONDecodeError:
-        print("Error reading orders.")
-        return
-
-    total_revenue = 0
-    dine_in_count = 0
-    takeaway_count = 0
-    total_discounts = 0
-    promo_codes_used = []
-
-    for order_id, order in all_orders.items():
-        total_revenue += order.get("total", 0)
-
-        if order.get("type") == "Dine-In":
-            dine_in_count += 1
-        elif order.get("type") == "Takeaway":
-            takeaway_count += 1
-
-        # Суммируем скидки из discounts
-        for discount in order.get("discounts", []):
-            total_discounts += discount.get("amount", 0)
-            if discount.get("promo_code"):
-                promo_codes_used.append(discount["promo_code"])
-
     print("\n=== Financial Summary ===")
-    print(f"Total revenue: RM{total_revenue:.2f}")
-    print(f"Total dine-in orders: {dine_in_count}")
-    print(f"Total takeaway orders: {takeaway_count}")
-    print(f"Total discounts given: RM{total_discounts:.2f}")
+    print(f"Total revenue: RM{finances['total_sales']:.2f}")
+    print(f"Total dine-in orders: {finances['dine_in']['count']}")
+    print(f"Total takeaway orders: {finances['take_away']['count']}")
+    print(f"Total discounts given: RM{finances['total_discounts']:.2f}")
 
-    if promo_codes_used:
+    if finances['promo_codes']:
         print("\nPromo codes used:")
-        for code in promo_codes_used:
-            print(f"- {code}")
+        for code, count in finances['promo_codes'].items():
+            print(f"- {code} (x{count})")
         
 def view_customer_feedback():
     feedback = load_lines_from_file("review.txt", default=[])
@@ -176,18 +115,14 @@ def view_customer_feedback():
         print(review)
 
 def load_promos():
-    try:
-        with open(PROMO_FILE, "r") as f:
-            content = f.read().strip()
-            if not content:
-                return {}
-            return json.loads(content)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def save_promos(promos):
-    with open(PROMO_FILE, "w") as f:
-        json.dump(promos, f, indent=4)
+    return load_file("promo_codes.txt")
+
+def save_promo(code, promo):
+    # One record per code, so managers editing different codes at once do not undo each other
+    save_record("promo_codes.txt", code, promo)
+
+def delete_promo(code):
+    delete_record("promo_codes.txt", code)
 
 def view_all_promo_codes():
     promos = load_promos()
@@ -240,7 +175,7 @@ def add_promo_code():
     if item_code:
         promos[code]["item_code"] = item_code
 
-    save_promos(promos)
+    save_promo(code, promos[code])
     print(f"Promo code '{code}' added successfully.")
 
 def delete_promo_code():
@@ -255,7 +190,7 @@ def delete_promo_code():
         return
 
     del promos[code]
-    save_promos(promos)
+    delete_promo(code)
     print(f"Promo code '{code}' deleted.")
     
 def manage_promo_codes():
@@ -0,0 +1,123 @@
+from dataclasses import dataclass, field, fields
+from utils.pricing import resolve_unit_price
+
+ORDERS_FILE = "current_active_orders.txt"
+# Order fields replaced by "lines"
+LEGACY_LINE_FIELDS = ("items", "item_details", "cart_contents", "customizations")
+
+@dataclass(slots=True)
+class LineItem:
+    code: str
+    name: str
+    quantity: int
+    unit_price: float
+    remark: str = ""
+    # Add-ons picked for this line, e.g. ["Bacon", "Avocado"]
+    modifiers: list = field(default_factory=list)
+    # Combo components as chosen in the cart, empty for single items
+    contents: dict = field(default_factory=dict)
+
+    @property
+    def total(self):
+        return self.unit_price * self.quantity
+
+    @property
+    def base_name(self):
+        return self.name.split("+")[0].strip()
+
+LINE_FIELDS = [f.name for f in fields(LineItem)]
+
+def line_from_dict(data):
+    return LineItem(data['code'], data['name'], data['quantity'], data['unit_price'], data.get('remark', ''),
+                    data.get('modifiers', []), data.get('contents', {}))
+
+def line_to_dict(line):
+    return {name: getattr(line, name) for name in LINE_FIELDS}
+
+def modifiers_from_name(name):
+    return [part.strip() for part in name.split("+")[1:]]
+
+def line_from_cart_item(cart_item, menu_items):
+    code = cart_item['id']
+    name = cart_item.get('name') or menu_items.get(code, {}).get('name', f'Unknown Item ({code})')
+    return LineItem(
+        code=code,
+        name=name,
+        quantity=cart_item.get('quantity', 1),
+        unit_price=resolve_unit_price(menu_items, code, name, cart_item),
+        remark=cart_item.get('remarks', ''),
+        modifiers=modifiers_from_name(name),
+        contents=cart_item.get('contents') or {}
+    )
+
+def legacy_lines(data, menu_items=None):
+    # Orders written before "lines" keep [code, qty, remark] in items, the cart in
+    # cart_contents and one description per code in item_details
+    items = data.get('items', [])
+    cart = [item for item in data.get('cart_contents', []) if isinstance(item, dict)]
+    paired = len(cart) == len(items) and all(item.get('id') == entry[0] for item, entry in zip(cart, items))
+    item_details = data.get('item_details', {})
+    lines = []
+    for idx, entry in enumerate(items):
+        code, quantity = entry[0], entry[1]
+        if paired:
+            cart_item = cart[idx]
+        else:
+            cart_item = next((item for item in cart if item.get('id') == code), None)
+        description = item_details.get(code)
+        if description is None and cart_item:
+            description = cart_item.get('custom_description')
+        if menu_items is not None:
+            name = description or menu_items.get(code, {}).get('name', f'Unknown Item ({code})')
+            price = resolve_unit_price(menu_items, code, description, cart_item)
+        else:
+            name = description or (cart_item or {}).get('name') or code
+            price = (cart_item or {}).get('price', 0)
+        lines.append(LineItem(code, name, quantity, price, entry[2] if len(entry) > 2 else "",
+                              modifiers_from_name(name), (cart_item or {}).get('contents') or {}))
+    return lines
+
+def order_lines(data, menu_items=None):
+    if 'lines' in data:
+        return [line_from_dict(line) for line in data['lines']]
+    return legacy_lines(data, menu_items)
+
+def normalize_order(data, menu_items):
+    if 'lines' in data:
+        return data
+    normalized = {key: value for key, value in data.items() if key not in LEGACY_LINE_FIELDS}
+    normalized['lines'] = [line_to_dict(line) for line in legacy_lines(data, menu_items)]
+    return normalized
+
+def migrate_order_files():
+    from utils.helpers import load_file, write_records, iter_transactions, save_transactions, use_sqlite
+
+    menu_items = load_file("menu_items.txt")
+    orders = load_file(ORDERS_FILE)
+    records = [{"op": "upsert", "key": order_id, "value": normalize_order(order, menu_items)}
+               for order_id, order in orders.items() if 'lines' not in order]
+    if records:
+        write_records(ORDERS_FILE, records)
+    print(f"Converted {len(records)} active order(s)")
+
+    transactions = iter_transactions()
+    if use_sqlite():
+        # The cursor cannot stay open while the same table is written
+        transactions = list(transactions)
+    converted = 0
+    batch = {}
+    for order_id, transaction in transactions:
+        if 'lines' in transaction:
+            continue
+        batch[order_id] = normalize_order(transaction, menu_items)
+        if len(batch) >= 500:
+            save_transactions(batch)
+            converted += len(batch)
+            batch = {}
+    if batch:
+        save_transactions(batch)
+        converted += len(batch)
+    print(f"Converted {converted} transaction(s)")
+
+if __name__ == "__main__":
+    migrate_order_files()
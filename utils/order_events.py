@@ -0,0 +1,62 @@
+import json
+import os
+from datetime import datetime
+from utils.helpers import DATA_DIR, data_lock, atomic_write
+
+# Append-only feed of order status changes, tailed by customer sessions
+EVENTS_FILE = "order_events.jsonl"
+# Past this the feed is restarted with its newer half, so it never grows unbounded
+EVENTS_MAX_BYTES = 256 * 1024
+
+def events_path():
+    return os.path.join(DATA_DIR, EVENTS_FILE)
+
+def publish_status(order_id, order, status):
+    publish_events([(order_id, order, status)])
+
+def publish_events(changes):
+    # changes is a list of (order_id, order, status)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    lines = [json.dumps({"order_id": order_id, "system_user": order.get("system_user", ""), "status": status,
+                         "type": order.get("type", ""), "timestamp": now}) + "\n"
+             for order_id, order, status in changes]
+    path = events_path()
+    try:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with data_lock(EVENTS_FILE):
+            if os.path.exists(path) and os.path.getsize(path) >= EVENTS_MAX_BYTES:
+                with open(path) as f:
+                    kept = f.readlines()
+                # A new file (new inode) tells subscribers to start over from its beginning
+                atomic_write(path, "".join(kept[len(kept) // 2:]))
+            with open(path, "a") as f:
+                f.write("".join(lines))
+    except IOError as e:
+        print(f"Error publishing order status: {e}")
+
+def event_cursor():
+    # Position just past the newest event, so a subscriber only sees what happens next
+    try:
+        stat = os.stat(events_path())
+    except FileNotFoundError:
+        return (None, 0)
+    return (stat.st_ino, stat.st_size)
+
+def read_events(cursor):
+    # Returns the events written since cursor and the cursor to pass next time
+    inode, offset = cursor
+    try:
+        stat = os.stat(events_path())
+    except FileNotFoundError:
+        return [], (None, 0)
+    if stat.st_ino != inode:
+        offset = 0
+    if stat.st_size <= offset:
+        return [], (stat.st_ino, offset)
+    with open(events_path(), "rb") as f:
+        f.seek(offset)
+        chunk = f.read(stat.st_size - offset)
+    # A line still being written is left for the next read
+    complete = chunk[:chunk.rfind(b"\n") + 1]
+    events = [json.loads(line) for line in complete.decode("utf-8").splitlines() if line.strip()]
+    return events, (stat.st_ino, offset + len(complete))
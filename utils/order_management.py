@@ -1,36 +1,28 @@
-from utils.helpers import calculate_order_total, calculate_custom_price, generate_receipt, load_file, save_to_file
+from utils.helpers import calculate_order_total, bump_revision, generate_receipt, load_file, data_lock, record_revision
+from utils.helpers import save_record, delete_record, add_discount_record, remove_discount_record
+from utils.helpers import write_records, save_transactions, data_version, wait_for_command, write_batch
 from utils.display import view_order_details, show_promo_codes
+from utils.aggregates import record_sales
+from utils import write_queue
+from utils.models import line_to_dict, order_lines
+from utils.kitchen_queue import build_status_index, index_move, queued_tickets, ticket_lines
+from utils.order_events import publish_status, publish_events
+from utils.user_orders import index_orders
+from utils.inventory import ingredient_usage, consume_reservations, release_reservations, held_orders
 from datetime import datetime
+
+ORDERS_FILE = "current_active_orders.txt"
+
+def reload_stale_order(order_id, current_orders):
+    print(f"Order {order_id} was changed on another terminal. Reloaded the latest version, please try again.")
+    latest = load_file(ORDERS_FILE).get(order_id)
+    if latest is None:
+        current_orders.pop(order_id, None)
+    else:
+        current_orders[order_id] = latest
+
 def apply_discount_to_entire_order(order_id, current_orders, menu_items, discount_type):
-    # Calculate order total using comprehensive logic
-    subtotal = 0
-    for item in current_orders[order_id].get("items", []):
-        item_code = item[0]
-        qty = item[1]
-        
-        if "item_details" in current_orders[order_id] and item_code in current_orders[order_id]["item_details"]:
-            price = calculate_custom_price(
-                item_code, 
-                current_orders[order_id]["item_details"][item_code], 
-                menu_items,
-                current_orders[order_id]
-            )
-        elif "cart_contents" in current_orders[order_id] and any(
-            c['id'] == item_code for c in current_orders[order_id]["cart_contents"]
-        ):
-            customized_desc = next(
-                (c['custom_description'] for c in current_orders[order_id]["cart_contents"] 
-                if c['id'] == item_code and 'custom_description' in c),
-                None
-            )
-            if customized_desc:
-                price = calculate_custom_price(item_code, customized_desc, menu_items, current_orders[order_id])
-            else:
-                price = menu_items.get(item_code, {}).get('price', 0)
-        else:
-            price = menu_items.get(item_code, {}).get('price', 0)
-        
-        subtotal += price * qty
+    subtotal = calculate_order_total(order_id, current_orders, menu_items)['subtotal']
     
     # Calculate remaining value after existing discounts
     existing_discounts = [d for d in current_orders[order_id].get("discounts", []) 
@@ -56,14 +48,18 @@ def apply_discount_to_entire_order(order_id, current_orders, menu_items, discoun
                 print(f"Cannot apply discount - order already fully discounted (remaining value: RM{remaining_value:.2f})")
                 return
 
-            current_orders[order_id].setdefault("discounts", []).append({
+            discount = {
                 "type": "percentage",
                 "value": percentage,
                 "description": f"{percentage}% off entire order",
                 "apply_to": "total",
                 "amount": discount_amount
-            })
-            save_to_file(current_orders, "current_active_orders.txt")
+            }
+            current_orders[order_id].setdefault("discounts", []).append(discount)
+            revision = bump_revision(current_orders[order_id])
+            if not add_discount_record(ORDERS_FILE, order_id, discount, revision):
+                reload_stale_order(order_id, current_orders)
+                return
             print(f"Applied {percentage}% discount to entire order (-RM{discount_amount:.2f})")
 
         except ValueError:
@@ -79,20 +75,23 @@ def apply_discount_to_entire_order(order_id, current_orders, menu_items, discoun
                 print(f"Discount cannot exceed remaining order value (RM{remaining_value:.2f})")
                 return
 
-            current_orders[order_id].setdefault("discounts", []).append({
+            discount = {
                 "type": "fixed",
                 "value": amount,
                 "description": f"RM{amount:.2f} off entire order",
                 "apply_to": "total",
                 "amount": amount
-            })
-            save_to_file(current_orders, "current_active_orders.txt")
+            }
+            current_orders[order_id].setdefault("discounts", []).append(discount)
+            revision = bump_revision(current_orders[order_id])
+            if not add_discount_record(ORDERS_FILE, order_id, discount, revision):
+                reload_stale_order(order_id, current_orders)
+                return
             print(f"Applied RM{amount:.2f} discount to entire order")
 
         except ValueError:
             print("Please enter a valid number.")
 
-    calculate_order_total(order_id, current_orders, menu_items)
     view_order_details("Order Details", order_id, current_orders[order_id], menu_items)
     
 def apply_discount_to_specific_item(order_id, current_orders, menu_items, discount_type):
@@ -101,40 +100,11 @@ def apply_discount_to_specific_item(order_id, current_orders, menu_items, discou
     print("=" * 80)
     
     items_with_prices = []
-    for idx, item in enumerate(current_orders[order_id]["items"], 1):
-        item_code = item[0]
-        qty = item[1]
-        
-        # Get display name
-        item_name = menu_items[item_code]['name']
-        if "item_details" in current_orders[order_id] and item_code in current_orders[order_id]["item_details"]:
-            item_name = current_orders[order_id]["item_details"][item_code]
-        
-        # Calculate price using same logic as view_order_details
-        if "item_details" in current_orders[order_id] and item_code in current_orders[order_id]["item_details"]:
-            price = calculate_custom_price(
-                item_code, 
-                current_orders[order_id]["item_details"][item_code], 
-                menu_items,
-                current_orders[order_id]
-            )
-        elif "cart_contents" in current_orders[order_id] and any(
-            c['id'] == item_code for c in current_orders[order_id]["cart_contents"]
-        ):
-            customized_desc = next(
-                (c['custom_description'] for c in current_orders[order_id]["cart_contents"] 
-                if c['id'] == item_code and 'custom_description' in c),
-                None
-            )
-            if customized_desc:
-                price = calculate_custom_price(item_code, customized_desc, menu_items, current_orders[order_id])
-            else:
-                price = menu_items[item_code]['price']
-        else:
-            price = menu_items[item_code]['price']
-        
-        total = price * qty
-        items_with_prices.append((idx, item_code, item_name, qty, price, total))
+    for idx, line in enumerate(calculate_order_total(order_id, current_orders, menu_items)['lines'], 1):
+        item_name = line.name
+        qty = line.quantity
+        total = line.total
+        items_with_prices.append((idx, line.code, item_name, qty, line.unit_price, total))
         
         print(f"[{idx}] {item_name:<60} {f'x{qty}':>5} RM{total:>7.2f}")
     
@@ -178,15 +148,19 @@ def apply_discount_to_specific_item(order_id, current_orders, menu_items, discou
                         print(f"Cannot apply discount - item already fully discounted (remaining value: RM{remaining_value:.2f})")
                         return
 
-                    current_orders[order_id].setdefault("discounts", []).append({
+                    discount = {
                         "type": "percentage",
                         "value": percentage,
                         "description": f"{percentage}% off on {item_name}",
                         "apply_to": "specific_item",
                         "item_code": item_code,
                         "amount": discount_amount
-                    })
-                    save_to_file(current_orders, "current_active_orders.txt")
+                    }
+                    current_orders[order_id].setdefault("discounts", []).append(discount)
+                    revision = bump_revision(current_orders[order_id])
+                    if not add_discount_record(ORDERS_FILE, order_id, discount, revision):
+                        reload_stale_order(order_id, current_orders)
+                        return
                     print(f"Applied {percentage}% discount to {item_name} (-RM{discount_amount:.2f})")
                     
                 except ValueError:
@@ -209,28 +183,31 @@ def apply_discount_to_specific_item(order_id, current_orders, menu_items, discou
                         print(f"Discount cannot exceed remaining item value (RM{remaining_value:.2f})")
                         return
 
-                    current_orders[order_id].setdefault("discounts", []).append({
+                    discount = {
                         "type": "fixed",
                         "value": amount,
                         "description": f"RM{amount:.2f} off on {item_name}",
                         "apply_to": "specific_item",
                         "item_code": item_code,
                         "amount": amount
-                    })
-                    save_to_file(current_orders, "current_active_orders.txt")
+                    }
+                    current_orders[order_id].setdefault("discounts", []).append(discount)
+                    revision = bump_revision(current_orders[order_id])
+                    if not add_discount_record(ORDERS_FILE, order_id, discount, revision):
+                        reload_stale_order(order_id, current_orders)
+                        return
                     print(f"Applied RM{amount:.2f} discount to {item_name}")
                     
                 except ValueError:
                     print("Please enter a valid amount number.")
                     return
 
-            calculate_order_total(order_id, current_orders, menu_items)
             view_order_details("Order Details", order_id, current_orders[order_id], menu_items)
         else:
             print("Invalid item number!")
             
     except ValueError:
-        print(f"Please enter a valid item number (1-{len(current_orders[order_id]['items'])}).")
+        print(f"Please enter a valid item number (1-{len(items_with_prices)}).")
     except Exception as e:
         print(f"An error occurred: {e}")
         print("Please try again.")
@@ -264,44 +241,12 @@ def apply_promo_code(order_id, current_orders, menu_items, promo_codes):
             print("Promo code configuration error: missing item code.")
             return
             
-        # Check if item exists in order
-        item_in_order = False
-        item_qty = 0
-        for item in current_orders[order_id]["items"]:
-            if item[0] == item_code:
-                item_in_order = True
-                item_qty = item[1]
-                break
-                
-        if not item_in_order:
+        pricing = calculate_order_total(order_id, current_orders, menu_items)
+        if item_code not in pricing['item_totals']:
             print(f"No {menu_items.get(item_code, {}).get('name', 'specified item')} in order for this promo.")
             return
         
-        # Calculate price using same logic as view_order_details
-        price = 0
-        if "item_details" in current_orders[order_id] and item_code in current_orders[order_id]["item_details"]:
-            price = calculate_custom_price(
-                item_code, 
-                current_orders[order_id]["item_details"][item_code], 
-                menu_items,
-                current_orders[order_id]
-            )
-        elif "cart_contents" in current_orders[order_id] and any(
-            c['id'] == item_code for c in current_orders[order_id]["cart_contents"]
-        ):
-            customized_desc = next(
-                (c['custom_description'] for c in current_orders[order_id]["cart_contents"] 
-                if c['id'] == item_code and 'custom_description' in c),
-                None
-            )
-            if customized_desc:
-                price = calculate_custom_price(item_code, customized_desc, menu_items, current_orders[order_id])
-            else:
-                price = menu_items.get(item_code, {}).get('price', 0)
-        else:
-            price = menu_items.get(item_code, {}).get('price', 0)
-        
-        applicable_total = price * item_qty
+        applicable_total = pricing['item_totals'][item_code]
 
         # Calculate existing discounts for this specific item
         existing_discounts = sum(
@@ -312,35 +257,8 @@ def apply_promo_code(order_id, current_orders, menu_items, promo_codes):
 
     elif promo['apply_to'] == 'total':
 
- # For total order discounts
-        subtotal = 0
-        for item in current_orders[order_id].get("items", []):
-            item_code = item[0]
-            qty = item[1]
-            
-            if "item_details" in current_orders[order_id] and item_code in current_orders[order_id]["item_details"]:
-                price = calculate_custom_price(
-                    item_code, 
-                    current_orders[order_id]["item_details"][item_code], 
-                    menu_items,
-                    current_orders[order_id]
-                )
-            elif "cart_contents" in current_orders[order_id] and any(
-                c['id'] == item_code for c in current_orders[order_id]["cart_contents"]
-            ):
-                customized_desc = next(
-                    (c['custom_description'] for c in current_orders[order_id]["cart_contents"] 
-                    if c['id'] == item_code and 'custom_description' in c),
-                    None
-                )
-                if customized_desc:
-                    price = calculate_custom_price(item_code, customized_desc, menu_items, current_orders[order_id])
-                else:
-                    price = menu_items.get(item_code, {}).get('price', 0)
-            else:
-                price = menu_items.get(item_code, {}).get('price', 0)
-            
-            subtotal += price * qty
+        # For total order discounts
+        subtotal = calculate_order_total(order_id, current_orders, menu_items)['subtotal']
 
         # Calculate existing discounts
         existing_discounts = current_orders[order_id].get("discounts", [])
@@ -377,11 +295,13 @@ def apply_promo_code(order_id, current_orders, menu_items, promo_codes):
         discount_entry['item_code'] = promo['item_code']
 
     current_orders[order_id].setdefault("discounts", []).append(discount_entry)
-    save_to_file(current_orders, "current_active_orders.txt")
+    revision = bump_revision(current_orders[order_id])
+    if not add_discount_record(ORDERS_FILE, order_id, discount_entry, revision):
+        reload_stale_order(order_id, current_orders)
+        return
     print(f"Successfully applied promo: {promo['description']} (-RM{discount_amount:.2f})")
 
     # Update and show order
-    calculate_order_total(order_id, current_orders, menu_items)
     view_order_details("Order Details", order_id, current_orders[order_id], menu_items)
 
 def apply_new_discount(order_id, current_orders, menu_items, promo_codes):
@@ -437,10 +357,12 @@ def remove_existing_discounts(order_id, current_orders, menu_items):
             return
         if 0 <= remove_idx < len(current_orders[order_id]["discounts"]):
             removed = current_orders[order_id]["discounts"].pop(remove_idx)
-            save_to_file(current_orders, "current_active_orders.txt")  # Save after applying discount
+            revision = bump_revision(current_orders[order_id])
+            if not remove_discount_record(ORDERS_FILE, order_id, removed, revision):
+                reload_stale_order(order_id, current_orders)
+                return
             print(f"Removed discount: {removed['description']}")
             
-            calculate_order_total(order_id, current_orders, menu_items)
             view_order_details("Order Details", order_id, current_orders[order_id], menu_items)
         else:
             print("Invalid selection.")
@@ -453,6 +375,10 @@ def manage_discounts(order_id, current_orders, menu_items, promo_codes):
         return
     
     while True:
+        if order_id not in current_orders:
+            print(f"Order {order_id} is no longer active.")
+            return
+
         print("\n=== Discount Management ===")
         print("1. Apply Discount")
         print("2. Remove Discount")
@@ -476,64 +402,189 @@ def manage_discounts(order_id, current_orders, menu_items, promo_codes):
             print("Invalid choice. Please try again.")
 
 
-def process_checkout(order_id, order, current_orders, menu_items, transactions):
-    calc = calculate_order_total(order_id, current_orders, menu_items)
-
-    total = max(0, calc['total'])
+PAYMENT_METHODS = {"1": "Cash", "2": "Card", "3": "Touch 'N Go"}
 
-    view_order_details("Order Details", order_id, order, menu_items)
+def choose_payment_method(last_option="Cancel"):
     while True:
         print("\nEnter Payment Method:")
         print("1. Cash")
         print("2. Card")
         print("3. Touch 'N Go")
-        print("4. Cancel")
-
-        payment_method = input("Enter Choice:").strip()
-
-        if payment_method == "1":
-           payment_method =  'Cash'
-           break
-        if payment_method == "2":
-           payment_method =  'Card'
-           break
-        if payment_method == "3":
-           payment_method =  "Touch 'N Go"
-           break
-        if payment_method == "4":
-           print("Transaction cancelled.")
-           return
-        else:
-            print("Invalid payment method.")
+        print(f"4. {last_option}")
+
+        choice = input("Enter Choice:").strip()
+
+        if choice in PAYMENT_METHODS:
+            return PAYMENT_METHODS[choice]
+        if choice == "4":
+            return None
+        print("Invalid payment method.")
 
-    transactions[order_id] = {
+def build_transaction(order, calc, payment_method, timestamp):
+    return {
         "type": order["type"],
-        "items": order["items"],
-        "item_details": order.get("item_details", {}),
-        "customizations": order.get("customizations", []),
-        "cart_contents": order.get("cart_contents", []),
+        "lines": [line_to_dict(line) for line in calc['lines']],
         "discounts": calc['discount_details'],
         "subtotal": calc['subtotal'], 
-        "tax": max(0, calc['total'] - calc['subtotal']), 
-        "total": total,  
+        "tax": calc['tax'],
+        "total": max(0, calc['total']),
         "payment_method": payment_method,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": timestamp,
         "system_user": order.get("system_user", ""),
         "display_name": order.get("display_name", ""),
+        "table_number": order.get("table_number", ""),
+        "remarks": order.get("remarks", ""),
         "status": "Completed"
     }
-    print(f"\nTransaction successful! Order {order_id} processed with {payment_method} payment.")
-    save_to_file(transactions, "transactions.txt")
 
-    generate_receipt(order_id, order, payment_method, menu_items)
-    del current_orders[order_id]
-    save_to_file(current_orders, "current_active_orders.txt")
+def close_orders(transactions, current_orders, menu_items):
+    # Records paid orders and removes them from the active list. On sqlite this is one
+    # commit. With text files every step skips what an interrupted checkout of the same
+    # orders already did, so checking them out again finishes the job.
+    order_ids = list(transactions)
+    with write_batch():
+        # Counters first, so a first-run rebuild from history does not count these sales twice
+        counted = record_sales(transactions)
+        save_transactions(transactions)
+        # Stock goes for orders still holding their reservation, and for orders that never
+        # had one the first time they are counted
+        stock_orders = set(held_orders(order_ids)) | set(counted)
+        usage = {}
+        for order_id in order_ids:
+            if order_id in stock_orders:
+                ingredient_usage(order_lines(transactions[order_id]), menu_items, usage)
+        consume_reservations(order_ids, usage)
+        write_records(ORDERS_FILE, [{"op": "delete", "key": order_id} for order_id in order_ids])
+        index_orders([(transactions[order_id]["system_user"], order_id, transactions[order_id]["timestamp"][:10])
+                      for order_id in order_ids])
+    publish_events([(order_id, current_orders[order_id], "Completed") for order_id in order_ids])
+
+def process_checkout(order_id, current_orders, menu_items):
+    order = current_orders[order_id]
+    calc = calculate_order_total(order_id, current_orders, menu_items)
 
+    view_order_details("Order Details", order_id, order, menu_items)
+    payment_method = choose_payment_method()
+    if payment_method is None:
+        print("Transaction cancelled.")
+        return
+
+    transaction = build_transaction(order, calc, payment_method, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    with data_lock(ORDERS_FILE):
+        # Charge exactly what was shown: refuse if another terminal changed or closed the order
+        if record_revision(ORDERS_FILE, order_id) != order.get("revision", 0):
+            reload_stale_order(order_id, current_orders)
+            return
+        close_orders({order_id: transaction}, current_orders, menu_items)
+        print(f"\nTransaction successful! Order {order_id} processed with {payment_method} payment.")
+        generate_receipt(order_id, order, payment_method, menu_items)
+        del current_orders[order_id]
+
+    write_queue.flush()
     print("\nOrder completed successfully! Refreshing active orders...\n")
     return
 
-def handle_order_actions(order_id, order, current_orders, menu_items, transactions):
+def batch_checkout(entries, current_orders, menu_items):
+    # entries is a list of (order_id, payment_method); if any order changed on another
+    # terminal nothing is charged, otherwise close_orders records them all together
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    transactions = {}
+    for order_id, payment_method in entries:
+        calc = calculate_order_total(order_id, current_orders, menu_items)
+        transactions[order_id] = build_transaction(current_orders[order_id], calc, payment_method, timestamp)
+
+    with data_lock(ORDERS_FILE):
+        stale = [order_id for order_id, _ in entries
+                 if record_revision(ORDERS_FILE, order_id) != current_orders[order_id].get("revision", 0)]
+        if stale:
+            for order_id in stale:
+                reload_stale_order(order_id, current_orders)
+            print("Batch checkout cancelled, no orders were charged.")
+            return False
+
+        close_orders(transactions, current_orders, menu_items)
+        for order_id, payment_method in entries:
+            generate_receipt(order_id, current_orders[order_id], payment_method, menu_items, show=False)
+            del current_orders[order_id]
+
+    write_queue.flush()
+    print("\n" + "=" * 80)
+    print("Batch Checkout Complete".center(80))
+    print("=" * 80)
+    for order_id, transaction in transactions.items():
+        line = f"{order_id:12} {transaction['payment_method']:<15}"
+        print(f"{line}{'RM' + format(transaction['total'] + transaction['tax'], '.2f'):>{80 - len(line)}}")
+    print("-" * 80)
+    grand_total = sum(transaction['total'] + transaction['tax'] for transaction in transactions.values())
+    print(f"{'Orders closed: ' + str(len(transactions)):<60}{'RM' + format(grand_total, '.2f'):>20}")
+    print("=" * 80)
+    print("Receipts saved to receipts/")
+    return True
+
+def select_batch_orders(orders_list):
+    print("\nEnter order numbers separated by commas, or 'served' for every served order.")
+    selection = input("Orders to check out: ").strip().lower()
+    if selection == "served":
+        return [oid for oid, order in orders_list if order.get('status') == 'Served']
+    order_ids = []
+    for part in selection.split(","):
+        try:
+            idx = int(part) - 1
+        except ValueError:
+            print(f"Invalid order number: {part.strip()}")
+            return []
+        if not 0 <= idx < len(orders_list):
+            print(f"Invalid order number: {part.strip()}")
+            return []
+        if orders_list[idx][0] not in order_ids:
+            order_ids.append(orders_list[idx][0])
+    return order_ids
+
+def batch_checkout_menu(orders_list, current_orders, menu_items):
+    order_ids = select_batch_orders(orders_list)
+    if not order_ids:
+        print("No orders selected.")
+        return
+
+    print("\nPayment method for all selected orders:")
+    payment_method = choose_payment_method("Choose Per Order")
+    entries = []
+    for order_id in order_ids:
+        method = payment_method
+        if method is None:
+            total = calculate_order_total(order_id, current_orders, menu_items)['grand_total']
+            print(f"\nOrder {order_id} (RM{total:.2f})")
+            method = choose_payment_method()
+            if method is None:
+                print("Batch checkout cancelled.")
+                return
+        entries.append((order_id, method))
+
+    print("\n" + "=" * 80)
+    print("Batch Checkout".center(80))
+    print("=" * 80)
+    grand_total = 0
+    for order_id, method in entries:
+        # Tax included, as on the receipt
+        total = calculate_order_total(order_id, current_orders, menu_items)['grand_total']
+        grand_total += total
+        line = f"{order_id:12} {method:<15}"
+        print(f"{line}{'RM' + format(total, '.2f'):>{80 - len(line)}}")
+    print("-" * 80)
+    print(f"{'Total:':<60}{'RM' + format(grand_total, '.2f'):>20}")
+    print("=" * 80)
+
+    confirm = input(f"Confirm checkout of {len(entries)} order(s)? (y/n): ").strip().lower()
+    if confirm == 'y':
+        batch_checkout(entries, current_orders, menu_items)
+    else:
+        print("Batch checkout cancelled.")
+
+def handle_order_actions(order_id, current_orders, menu_items):
     while True:
+        if order_id not in current_orders:
+            print(f"Order {order_id} is no longer active.")
+            return
         promo_codes = load_file('promo_codes.txt')
 
         print("\nSelect An Option:")
@@ -550,13 +601,18 @@ def handle_order_actions(order_id, order, current_orders, menu_items, transactio
         elif action == "2":
             confirm = input(f"Confirm cancel order {order_id}? (y/n): ").strip().lower()
             if confirm == 'y':
-                del current_orders[order_id]
-                save_to_file(current_orders, "current_active_orders.txt")
+                if not delete_record(ORDERS_FILE, order_id, current_orders[order_id].get("revision", 0)):
+                    reload_stale_order(order_id, current_orders)
+                    continue
+                order = current_orders.pop(order_id)
+                release_reservations([order_id])
+                index_orders([(order.get("system_user", ""), order_id, None)])
+                publish_status(order_id, order, "Cancelled")
 
                 print(f"Order {order_id} cancelled.")
                 return
         elif action == "3":
-            process_checkout(order_id, order, current_orders, menu_items, transactions)
+            process_checkout(order_id, current_orders, menu_items)
             return
             
         elif action == "4":
@@ -564,8 +620,10 @@ def handle_order_actions(order_id, order, current_orders, menu_items, transactio
         else:
             print("Invalid choice!")
 
-def view_active_orders(current_orders, menu_items, transactions):
+def view_active_orders(menu_items):
     while True:
+        # Reloaded every time so orders placed or changed on other terminals show up
+        current_orders = load_file(ORDERS_FILE)
 
         if not current_orders:
             print("\nNo active orders.")
@@ -584,10 +642,14 @@ def view_active_orders(current_orders, menu_items, transactions):
             print("-" * 80)
         print("="*80)
 
-        choice = input("\nSelect Order Number to View Details or 'done' to Return: ").strip().lower()
+        choice = input("\nSelect Order Number to View Details, 'batch' for Batch Checkout or 'done' to Return: ").strip().lower()
         
         if choice == "done":
             break
+
+        if choice == "batch":
+            batch_checkout_menu(orders_list, current_orders, menu_items)
+            continue
             
         try:
             idx = int(choice) - 1
@@ -595,14 +657,26 @@ def view_active_orders(current_orders, menu_items, transactions):
                 oid, order = orders_list[idx]
 
                 view_order_details("Order Details", oid, order, menu_items)
-                handle_order_actions(oid, order, current_orders, menu_items, transactions)
+                handle_order_actions(oid, current_orders, menu_items)
             else:
                 print("Invalid order number!")
         except ValueError:
             print("4 Please enter a valid number!")
 
 
-def handle_order_status(order_id, order, current_orders):
+def update_order_status(order_id, current_orders, status):
+    order = current_orders[order_id]
+    base_revision = order.get("revision", 0)
+    order['status'] = status
+    bump_revision(order)
+    if not save_record(ORDERS_FILE, order_id, order, base_revision):
+        reload_stale_order(order_id, current_orders)
+        return False
+    publish_status(order_id, order, status)
+    print(f"Order {order_id} status updated to {status}.")
+    return True
+
+def choose_order_status(order_id, order):
     current_status = order.get('status', 'Pending')
     print(f"\nCurrent status for Order {order_id}: {current_status}")
     print("Select New Status:")
@@ -614,56 +688,69 @@ def handle_order_status(order_id, order, current_orders):
     status_choice = input("\nEnter Choice: ").strip()
     
     if status_choice == "1":
-        current_orders[order_id]['status'] = "Preparing"
-        save_to_file(current_orders, "current_active_orders.txt")
-        print(f"Order {order_id} status updated to Preparing.")
+        return "Preparing"
     elif status_choice == "2":
-        current_orders[order_id]['status'] = "Served"
-        save_to_file(current_orders, "current_active_orders.txt")
-        print(f"Order {order_id} status updated to Served.")
+        return "Served"
     elif status_choice == "3":
-        current_orders[order_id]['status'] = "Pending"
-        save_to_file(current_orders, "current_active_orders.txt")
-        print(f"Order {order_id} status updated to Pending.")
-    elif status_choice == "4":
-        return
-    else:
+        return "Pending"
+    elif status_choice != "4":
         print("Invalid choice!")
+    return None
 
 def chef_view_active_orders():
-    current_orders = load_file('current_active_orders.txt')
     menu_items = load_file('menu_items.txt')
-    
-    if not current_orders:
-        print("\nNo active orders.")
-        return
+    version = data_version(ORDERS_FILE)
+    current_orders = load_file(ORDERS_FILE)
+    index = build_status_index(current_orders)
 
     while True:
+        if not current_orders:
+            print("\nNo active orders.")
+            return
+
         print("\n" + "="*80)
-        print("Active Orders".center(80))
+        print("Kitchen Queue".center(80))
         print("="*80)
 
-        orders_list = list(current_orders.items())
-        for idx, (oid, order) in enumerate(orders_list, 1):
-            status = order.get('status', '[Pending]')
-            line = f"[{idx}]: {oid:12}"
-            status_str = f"Status: {status}"
-            print(f"{line}{status_str:>{80 - len(line)}}")
+        tickets = queued_tickets(index)
+        for idx, (status, oid) in enumerate(tickets, 1):
+            for line in ticket_lines(idx, oid, current_orders[oid]):
+                print(line)
             print("-" * 80)
         print("="*80)
 
-        choice = input("\nSelect Order Number to View Details or 'done' to Return: ").strip().lower()
-        
+        # Redraws by itself when another terminal places or updates an order
+        choice = wait_for_command("\nSelect Order Number to Update Status or 'done' to Return: ",
+                                  lambda: data_version(ORDERS_FILE) != version)
+        if choice is None:
+            version = data_version(ORDERS_FILE)
+            current_orders = load_file(ORDERS_FILE)
+            index = build_status_index(current_orders)
+            continue
+        choice = choice.strip().lower()
+
         if choice == "done":
             break
             
         try:
             idx = int(choice) - 1
-            if 0 <= idx < len(orders_list):
-                oid, order = orders_list[idx]
-                view_order_details("Order Details", oid, order, menu_items)
-                handle_order_status(oid, order, current_orders)
+            if 0 <= idx < len(tickets):
+                old_status, oid = tickets[idx]
+                view_order_details("Order Details", oid, current_orders[oid], menu_items)
+                status = choose_order_status(oid, current_orders[oid])
+                if status is None:
+                    continue
+                with data_lock(ORDERS_FILE):
+                    unchanged = data_version(ORDERS_FILE) == version
+                    if update_order_status(oid, current_orders, status) and unchanged:
+                        # Only our own write landed, so the index can be patched in place
+                        index_move(index, oid, current_orders[oid], old_status)
+                        version = data_version(ORDERS_FILE)
+                        continue
+                version = data_version(ORDERS_FILE)
+                current_orders = load_file(ORDERS_FILE)
+                index = build_status_index(current_orders)
             else:
                 print("Invalid order number!")
         except ValueError:
-            print("Please enter a valid number or command!")
\ No newline at end of file
+            print("Please enter a valid number or command!")
@@ -0,0 +1,56 @@
+# Compiled lookup tables for the menu currently in use. load_file hands back the
+# same dict until menu_items.txt changes, so identity is enough to spot a new version.
+_compiled_menu = {"menu": None, "table": None}
+
+def compile_price_table(menu_items):
+    table = {}
+    for code, item in menu_items.items():
+        table[code] = {
+            'name': item.get('name', f'Unknown Item ({code})'),
+            'price': item.get('price', 0),
+            'combo': 'contents' in item,
+            'addons': {name: details.get('price', 0) for name, details in item.get('ingredients', {}).items()},
+            # "+Bacon +Avocado" descriptions already priced for this menu version
+            'described': {}
+        }
+    return table
+
+def get_price_table(menu_items):
+    if _compiled_menu["menu"] is not menu_items:
+        _compiled_menu["menu"] = menu_items
+        _compiled_menu["table"] = compile_price_table(menu_items)
+    return _compiled_menu["table"]
+
+def described_price(entry, description):
+    price = entry['described'].get(description)
+    if price is None:
+        price = entry['price']
+        for ingredient in description.split("+")[1:]:
+            price += entry['addons'].get(ingredient.strip(), 0)
+        entry['described'][description] = price
+    return price
+
+def combo_price(table, code, cart_item):
+    addons_total = 0
+    for content_code, content_data in cart_item.get('contents', {}).items():
+        if not isinstance(content_data, list):
+            continue
+        base_price = table.get(content_code, {}).get('price', 0)
+        for custom_item in content_data:
+            if custom_item and isinstance(custom_item, dict) and custom_item.get('customizations'):
+                custom_price = custom_item['customizations'].get('price', base_price)
+                addons_total += (custom_price - base_price) * custom_item.get('quantity', 1)
+    return table[code]['price'] + addons_total
+
+def unit_price(table, code, description, cart_item):
+    entry = table.get(code)
+    if entry is None:
+        return 0
+    if entry['combo']:
+        return combo_price(table, code, cart_item) if cart_item else entry['price']
+    if description and "+" in description:
+        return described_price(entry, description)
+    return entry['price']
+
+def resolve_unit_price(menu_items, code, description, cart_item):
+    return unit_price(get_price_table(menu_items), code, description, cart_item)
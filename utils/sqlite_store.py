@@ -0,0 +1,196 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+DB_FILE = os.path.join("data", "restaurant.db")
+
+# Files with their own table; every other JSON data file lives in `documents`
+TABLE_FILES = {
+    "current_active_orders.txt": "active_orders",
+    "transactions.txt": "transactions",
+}
+
+# Files copied over by migrate_from_text_files
+MIGRATED_FILES = [
+    "current_active_orders.txt",
+    "menu_items.txt",
+    "promo_codes.txt",
+    "inventory.txt",
+    "recipe.txt",
+    "equipment.txt",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS active_orders (
+    order_id TEXT PRIMARY KEY,
+    status TEXT,
+    system_user TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+DROP INDEX IF EXISTS idx_active_orders_status;
+CREATE INDEX IF NOT EXISTS idx_active_orders_user ON active_orders (system_user);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    order_id TEXT PRIMARY KEY,
+    timestamp TEXT,
+    system_user TEXT,
+    payment_method TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions (timestamp);
+CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions (system_user);
+
+CREATE TABLE IF NOT EXISTS carts (
+    user TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS documents (
+    file TEXT NOT NULL,
+    key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (file, key)
+);
+"""
+
+_connection = None
+# Depth of nested transaction() blocks; only the outermost one commits
+_transaction_depth = 0
+
+def get_connection():
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
+        _connection = sqlite3.connect(DB_FILE)
+        _connection.executescript(SCHEMA)
+    return _connection
+
+@contextmanager
+def transaction():
+    # Every write made inside goes into one commit, or is rolled back if anything raises
+    global _transaction_depth
+    conn = get_connection()
+    _transaction_depth += 1
+    try:
+        if _transaction_depth > 1:
+            yield conn
+        else:
+            with conn:
+                yield conn
+    finally:
+        _transaction_depth -= 1
+
+def _row_columns(file, key, value):
+    table = TABLE_FILES.get(file)
+    data = json.dumps(value)
+    if table == "active_orders":
+        return ("INSERT INTO active_orders (order_id, status, system_user, timestamp, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (order_id) DO UPDATE SET status = excluded.status, system_user = excluded.system_user, "
+                "timestamp = excluded.timestamp, data = excluded.data",
+                (key, value.get("status"), value.get("system_user"), value.get("timestamp"), data))
+    if table == "transactions":
+        return ("INSERT INTO transactions (order_id, timestamp, system_user, payment_method, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (order_id) DO UPDATE SET timestamp = excluded.timestamp, system_user = excluded.system_user, "
+                "payment_method = excluded.payment_method, data = excluded.data",
+                (key, value.get("timestamp"), value.get("system_user"), value.get("payment_method"), data))
+    return ("INSERT INTO documents (file, key, data) VALUES (?, ?, ?) "
+            "ON CONFLICT (file, key) DO UPDATE SET data = excluded.data",
+            (file, key, data))
+
+def _iter_select(file, where="", params=()):
+    table = TABLE_FILES.get(file)
+    if table:
+        sql = f"SELECT order_id, data FROM {table} {where} ORDER BY rowid"
+    else:
+        sql = f"SELECT key, data FROM documents WHERE file = ? {where} ORDER BY rowid"
+        params = (file,) + tuple(params)
+    for key, data in get_connection().execute(sql, params):
+        yield key, json.loads(data)
+
+def _select(file, where="", params=()):
+    return dict(_iter_select(file, where, params))
+
+def load_table(file):
+    return _select(file)
+
+def save_table(data, file):
+    table = TABLE_FILES.get(file)
+    with transaction() as conn:
+        if table:
+            conn.execute(f"DELETE FROM {table}")
+        else:
+            conn.execute("DELETE FROM documents WHERE file = ?", (file,))
+        for key, value in data.items():
+            conn.execute(*_row_columns(file, key, value))
+
+def upsert_row(file, key, value):
+    with transaction() as conn:
+        conn.execute(*_row_columns(file, key, value))
+
+def delete_row(file, key):
+    table = TABLE_FILES.get(file)
+    with transaction() as conn:
+        if table:
+            conn.execute(f"DELETE FROM {table} WHERE order_id = ?", (key,))
+        else:
+            conn.execute("DELETE FROM documents WHERE file = ? AND key = ?", (file, key))
+
+def write_rows(file, upserts, deletes):
+    table = TABLE_FILES.get(file)
+    with transaction() as conn:
+        for key, value in upserts:
+            conn.execute(*_row_columns(file, key, value))
+        if table:
+            conn.executemany(f"DELETE FROM {table} WHERE order_id = ?", [(key,) for key in deletes])
+        else:
+            conn.executemany("DELETE FROM documents WHERE file = ? AND key = ?", [(file, key) for key in deletes])
+
+def load_row(file, key):
+    if TABLE_FILES.get(file):
+        return _select(file, "WHERE order_id = ?", (key,)).get(key)
+    return _select(file, "AND key = ?", (key,)).get(key)
+
+def load_orders_for_user(system_user):
+    return _select("current_active_orders.txt", "WHERE system_user = ?", (system_user,))
+
+def iter_transactions_between(start, end):
+    # Timestamps are stored as "%Y-%m-%d %H:%M:%S" so string order is time order
+    return _iter_select("transactions.txt", "WHERE timestamp >= ? AND timestamp < ?", (start, end))
+
+def load_cart(user):
+    row = get_connection().execute("SELECT data FROM carts WHERE user = ?", (user,)).fetchone()
+    return json.loads(row[0]) if row else []
+
+def save_cart(user, cart):
+    with transaction() as conn:
+        conn.execute("INSERT INTO carts (user, data) VALUES (?, ?) "
+                     "ON CONFLICT (user) DO UPDATE SET data = excluded.data",
+                     (user, json.dumps(cart)))
+
+def migrate_from_text_files():
+    from utils.helpers import load_text_file, load_partitioned_transactions
+    from utils.customer_functions.cart_management import load_legacy_carts, load_text_carts, migrate_legacy_carts
+
+    for file in MIGRATED_FILES:
+        data = load_text_file(file)
+        save_table(data, file)
+        print(f"Migrated {len(data)} record(s) from {file}")
+
+    transactions = load_partitioned_transactions()
+    save_table(transactions, "transactions.txt")
+    print(f"Migrated {len(transactions)} transaction(s)")
+
+    # Carts still in the old single carts.txt go straight into the carts table
+    migrated = {user for user, cart in load_legacy_carts().items() if cart}
+    migrate_legacy_carts()
+    for user, cart in load_text_carts().items():
+        if cart:
+            save_cart(user, cart)
+            migrated.add(user)
+    print(f"Migrated {len(migrated)} cart(s)")
+    print(f"Database written to {DB_FILE}")
+
+if __name__ == "__main__":
+    migrate_from_text_files()
@@ -0,0 +1,96 @@
+import os
+import sys
+import tempfile
+import time
+from utils import helpers
+from utils.helpers import DATA_DIR, LEGACY_TRANSACTIONS_FILE, atomic_write, load_file_if_exists, use_sqlite
+from utils.helpers import iter_transactions, iter_text_records, read_snapshot, serialize_snapshot
+from utils.helpers import transaction_days, transaction_partition
+
+ORDERS_FILE = "current_active_orders.txt"
+RUNS = 200
+FORMAT_RUNS = 3
+FORMAT_TRANSACTIONS = 20000
+
+def sample_orders(count=None):
+    # The orders on file, repeated under new ids up to count; nothing under data/ is written
+    orders = list(load_file_if_exists(ORDERS_FILE).values())
+    if not orders:
+        return {}
+    count = len(orders) if count is None else count
+    return {f"B{n:05d}": orders[n % len(orders)] for n in range(count)}
+
+def sample_transactions(count):
+    # Reads the history as it is on disk, without the partition migration iter_transactions runs
+    if use_sqlite():
+        history = [transaction for _, transaction in iter_transactions()]
+    else:
+        history = [transaction for day in transaction_days()
+                   for _, transaction in iter_text_records(transaction_partition(day))]
+        legacy = os.path.join(DATA_DIR, LEGACY_TRANSACTIONS_FILE)
+        if os.path.exists(legacy):
+            history += list(read_snapshot(LEGACY_TRANSACTIONS_FILE, legacy).values())
+    if not history:
+        return {}
+    return {f"B{n:06d}": history[n % len(history)] for n in range(count)}
+
+def time_ms(action, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        action()
+    return (time.perf_counter() - start) * 1000 / runs
+
+def plain_write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def benchmark_atomic_write(runs=RUNS):
+    # [(orders, bytes, plain ms, atomic ms, atomic with .bak ms)] per snapshot size
+    results = []
+    # Next to data/ so the renames and fsyncs hit the same filesystem
+    with tempfile.TemporaryDirectory(dir=DATA_DIR, prefix=".bench-") as directory:
+        path = os.path.join(directory, ORDERS_FILE)
+        for count in (None, 500):
+            orders = sample_orders(count)
+            text = helpers.dumps(orders)
+            results.append((len(orders), len(text.encode()),
+                            time_ms(lambda: plain_write(path, text), runs),
+                            time_ms(lambda: atomic_write(path, text), runs),
+                            time_ms(lambda: atomic_write(path, text, backup=True), runs)))
+    return results
+
+def benchmark_formats(count=FORMAT_TRANSACTIONS, runs=FORMAT_RUNS):
+    # [(format, file, bytes, save ms, load ms)] for the transaction history in each layout
+    transactions = sample_transactions(count)
+    results = []
+    previous = helpers.STORAGE_FORMAT
+    try:
+        with tempfile.TemporaryDirectory(dir=DATA_DIR, prefix=".bench-") as directory:
+            for storage_format in ("pretty", "compact"):
+                helpers.STORAGE_FORMAT = storage_format
+                for file in (LEGACY_TRANSACTIONS_FILE, "transactions.jsonl"):
+                    path = os.path.join(directory, file)
+                    save = time_ms(lambda: atomic_write(path, serialize_snapshot(file, transactions)), runs)
+                    load = time_ms(lambda: read_snapshot(file, path), runs)
+                    results.append((storage_format, file, os.path.getsize(path), save, load))
+    finally:
+        helpers.STORAGE_FORMAT = previous
+    return len(transactions), results
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "atomic"
+    if command == "atomic":
+        runs = int(sys.argv[2]) if len(sys.argv) > 2 else RUNS
+        print(f"Snapshot write overhead, mean of {runs} writes:")
+        for orders, size, plain, atomic, backup in benchmark_atomic_write(runs):
+            print(f"  {orders:>4} active orders ({size / 1024:.0f} KB): "
+                  f"plain {plain:.2f} ms, atomic {atomic:.2f} ms, +backup {backup:.2f} ms")
+    elif command == "format":
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else FORMAT_TRANSACTIONS
+        count, results = benchmark_formats(count)
+        print(f"{count} transactions, mean of {FORMAT_RUNS} runs:")
+        print(f"  {'format':<8} {'file':<20} {'size':>9} {'save':>10} {'load':>10}")
+        for storage_format, file, size, save, load in results:
+            print(f"  {storage_format:<8} {file:<20} {size / 1024 / 1024:>6.2f} MB {save:>7.1f} ms {load:>7.1f} ms")
+    else:
+        print("Usage: python -m utils.storage_benchmark [atomic [runs] | format [transactions]]")
@@ -0,0 +1,77 @@
+import os
+from utils import sqlite_store
+from utils.helpers import DATA_DIR, load_file, write_records, save_to_file, journal_path, use_sqlite, data_lock
+from utils.helpers import iter_transactions, load_transaction
+
+USER_ORDERS_FILE = "user_orders.txt"
+ORDERS_FILE = "current_active_orders.txt"
+# Location of an order that has not been checked out yet; otherwise the checkout day
+ACTIVE = "active"
+
+def build_user_order_index():
+    index = {}
+    for order_id, order in load_file(ORDERS_FILE).items():
+        index.setdefault(order.get("system_user", ""), {})[order_id] = ACTIVE
+    for order_id, transaction in iter_transactions():
+        index.setdefault(transaction.get("system_user", ""), {})[order_id] = transaction.get("timestamp", "")[:10]
+    return index
+
+def load_user_order_index():
+    exists = os.path.exists(os.path.join(DATA_DIR, USER_ORDERS_FILE)) or os.path.exists(journal_path(USER_ORDERS_FILE))
+    index = load_file(USER_ORDERS_FILE) if use_sqlite() or exists else {}
+    if not index:
+        # First run after upgrading: index the orders already on file
+        with data_lock(USER_ORDERS_FILE):
+            index = build_user_order_index()
+            save_to_file(index, USER_ORDERS_FILE)
+    return index
+
+def user_order_ids(system_user):
+    # order_id -> ACTIVE or checkout day, for one user
+    if use_sqlite():
+        order_ids = sqlite_store.load_row(USER_ORDERS_FILE, system_user)
+        if order_ids is not None:
+            return order_ids
+    return load_user_order_index().get(system_user, {})
+
+def load_active_order(order_id):
+    if use_sqlite():
+        return sqlite_store.load_row(ORDERS_FILE, order_id)
+    return load_file(ORDERS_FILE).get(order_id)
+
+def index_orders(entries):
+    # entries is a list of (system_user, order_id, location); a location of None drops the order
+    with data_lock(USER_ORDERS_FILE):
+        updated = {}
+        for system_user, order_id, location in entries:
+            if system_user not in updated:
+                updated[system_user] = dict(user_order_ids(system_user))
+            if location is None:
+                updated[system_user].pop(order_id, None)
+            else:
+                updated[system_user][order_id] = location
+        write_records(USER_ORDERS_FILE, [{"op": "upsert", "key": system_user, "value": order_ids}
+                                         for system_user, order_ids in updated.items()])
+
+def load_user_orders(system_user):
+    # Active and completed orders of one user, without scanning anyone else's
+    orders = {}
+    # sqlite fetches all of the user's active orders with one query on idx_active_orders_user
+    active = sqlite_store.load_orders_for_user(system_user) if use_sqlite() else None
+    for order_id, location in user_order_ids(system_user).items():
+        if location == ACTIVE:
+            order = load_active_order(order_id) if active is None else active.get(order_id)
+        else:
+            order = load_transaction(order_id, location)
+        if order is not None:
+            orders[order_id] = order
+    return orders
+
+def rebuild_user_order_index():
+    with data_lock(USER_ORDERS_FILE):
+        index = build_user_order_index()
+        save_to_file(index, USER_ORDERS_FILE)
+    print(f"Indexed {sum(len(order_ids) for order_ids in index.values())} order(s) for {len(index)} user(s)")
+
+if __name__ == "__main__":
+    rebuild_user_order_index()
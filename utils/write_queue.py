@@ -0,0 +1,69 @@
+import atexit
+import queue
+import threading
+
+# Saves waiting for the writer thread; past this the caller does the write itself
+QUEUE_SIZE = 32
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+# key -> (lock, job) not started yet; a newer save of the same key replaces the older one
+_pending = {}
+_running = set()
+_state = threading.Condition()
+_worker = None
+
+def submit(key, lock, job):
+    # lock() must return the context manager guarding key, job() does the actual write
+    global _worker
+    with _state:
+        queued = key in _pending
+        _pending[key] = (lock, job)
+        if _worker is None:
+            _worker = threading.Thread(target=_run, name="write-queue", daemon=True)
+            _worker.start()
+    if not queued:
+        try:
+            _queue.put_nowait(key)
+        except queue.Full:
+            flush(key)
+
+def _run():
+    while True:
+        key = _queue.get()
+        with _state:
+            entry = _pending.get(key)
+        if entry is not None:
+            # Take the file lock before claiming the job, so flush() from a thread
+            # that already holds the lock can always run the job itself
+            with entry[0]():
+                with _state:
+                    entry = _pending.pop(key, None)
+                    if entry is not None:
+                        _running.add(key)
+                if entry is not None:
+                    _execute(key, entry[1])
+                    with _state:
+                        _running.discard(key)
+                        _state.notify_all()
+        _queue.task_done()
+
+def _execute(key, job):
+    try:
+        job()
+    except Exception as e:
+        print(f"Error saving {key}: {e}")
+
+def flush(key=None):
+    # Barrier: returns once the pending save of key (or of everything) is on disk
+    if threading.current_thread() is _worker:
+        return
+    with _state:
+        keys = [key] if key is not None else list(_pending)
+        claimed = [(k, _pending.pop(k)) for k in keys if k in _pending]
+    for k, (lock, job) in claimed:
+        with lock():
+            _execute(k, job)
+    with _state:
+        _state.wait_for(lambda: key not in _running if key is not None else not _running)
+
+atexit.register(flush)